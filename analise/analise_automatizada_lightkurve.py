@@ -10,6 +10,15 @@ Variáveis de controle.
 ASTROLAB = True
 DOWNLOAD_PLOT = False
 LIMIT_Y = True
+INCREMENTAL_SEARCH = False
+BATCH_SEARCH = False
+COVERAGE_MIN = 0.9 # Fração mínima da fase coberta pela curva dobrada (None = todos os períodos)
+OFFLINE = False # Usa apenas as curvas já guardadas no armazenamento local (fits_store.py)
+DOWNLOAD_WORKERS = 8 # Alvos baixados ao mesmo tempo
+EXPORT_COLUMNAR = True # Grava tempo, fluxo e erro de cada alvo no armazenamento colunar (columnar_store.py)
+COLUMNAR_FLOAT32 = True # Fluxo e erro em float32 no armazenamento colunar
+STREAMING = False # Processa setor a setor (sector_stream.py): a curva sobreposta vira a média por partição de fase, sem buscas incremental e em lote
+BINNED_EPOCH = True # Centraliza o trânsito pelas partições de fase (epoca_transito.py) em vez da vizinhança
 
 #%%
 """
@@ -21,14 +30,24 @@ Bibliotecas a serem importadas:
     * scipy : https://docs.scipy.org/doc/scipy/
     * math : https://docs.python.org/3/library/math.html
 """
-import lightkurve as lk # versão 2.4.2
 import numpy as np # versão 1.26.4
 import matplotlib.pyplot as plt # versão 3.5.1
 import matplotlib.ticker as ticker # versão 3.5.1
 import pandas as pd # versão 2.2.1
-import scipy.spatial as ss # versão 1.8.0
 import math as mt # versão 3.12.4
 import os # versão 3.12.4
+import sys # versão 3.12.4
+
+# Funções de busca de período da pasta 'periodicidade'
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'periodicidade'))
+from busca_incremental import criar_estatistica, adicionar_setor, buscar_periodo_incremental, carregar_estatistica, grade_adequada
+from grade_periodos import grade_periodos
+from epoca_transito import epocas_transito, epoca_transito
+from motor_periodo import concatenar_curvas, minimizar_comprimento_multialvo
+from fits_store import fetch_light_curves, fetch_many, read_light_curves
+from columnar_store import COLUMNAR_DIR, export_collection, read_targets
+from sector_stream import stream_target, profile_light_curve
+from neighborhood import neighborhood
 
 #%%
 """
@@ -84,30 +103,14 @@ def epslon(flux_medium, flux_minimun):
     return epslon
 
 #%%
-def neighborhood(points, radius):
-    best_point = None
-    for point in points:
-        # Calcular a distância de 'point' para todos os outros pontos
-        distances = ss.distance.cdist([point], points, 'euclidean').flatten()
-        # Contar quantos pontos estão dentro do raio (excluindo o próprio ponto)
-        neighbors = np.sum(distances < radius) - 1
-        if neighbors >= 10:  # Se um ponto tiver no mínimo 10 vizinhos, terminar a busca
-            best_point = point
-            break 
-    return best_point
-
-#%%
-def light_curve(star_name, orbital_period):
+def light_curve(star_name, orbital_period, lc_collection=None, transit_duration=None):
     
-    # Pesquisa todas as curvas com esse conjunto de endereçoes 
-    search_result = lk.search_lightcurve(f'TIC {star_name}',
-                                         cadence ='short',     
-                                         mission = 'TESS',     
-                                         author = 'SPOC', 
-                                         )
-    
-    # Downloado de todas as curvas encontradas na pesquisa 
-    lc_collection = search_result.download_all()
+    # Curvas do armazenamento local; a pesquisa e o download no MAST só acontecem para
+    # setores que ainda não estão no disco (OFFLINE = True nunca usa a rede). A etapa de
+    # download concorrente (fetch_many) já entrega as curvas lidas
+    if lc_collection is None:
+        paths = fetch_light_curves(star_name, author='SPOC', cadence='short', offline=OFFLINE)
+        lc_collection = read_light_curves(paths)
     
     # Une e normaliza todas as curvas baixadas 
     lc_aux = lc_collection.stitch()
@@ -116,6 +119,12 @@ def light_curve(star_name, orbital_period):
     lc_normal = lc_aux.remove_nans()
     time_initial = lc_normal.time.value[0] 
     
+    if BINNED_EPOCH and transit_duration is not None:
+        # Época pelo mínimo do fluxo médio em uma janela da duração do trânsito (em horas)
+        epoch = epoca_transito(lc_normal.time.value, lc_normal.flux.value, orbital_period, transit_duration / 24)
+        lc_superposition = lc_normal.fold(orbital_period, epoch)
+        return lc_collection, lc_normal, lc_superposition
+    
     # Primeira dobra para sobrepor o fluxo e reduzir o tempo
     lc_fold = lc_normal.fold(orbital_period, time_initial)
     
@@ -139,6 +148,8 @@ def plot_light_curve_superposition(lc_set, transit_duration, planet_name, orbita
     j_list = [False, True]
     for lc in lc_set:
         i = i + 1
+        if lc is None: # Alvo que falhou no download
+            continue
         k = -1
         for j in j_list: 
             k = k + 1
@@ -195,15 +206,101 @@ def plot_light_curve_superposition(lc_set, transit_duration, planet_name, orbita
             plt.show()
 
 #%%
-lc_collection = []
-lc_normal = []
-lc_superposition = []
-for i in range(len(planet_names)):
-    print(i)
-    lc_c, lc_n, lc_s = light_curve(star_names[i], orbital_periods[i])
-    lc_collection.append(lc_c)
-    lc_normal.append(lc_n)
-    lc_superposition.append(lc_s)
+"""
+Download e processamento. Os alvos são baixados e lidos por DOWNLOAD_WORKERS threads e
+cada alvo é processado assim que chega, na ordem em que ficam prontos; as listas
+mantêm a ordem da tabela. Um alvo que falha em todas as tentativas fica com None nas
+listas e vai para 'failed', sem interromper os demais.
+"""
+failed = []
+lc_collection = [None] * len(planet_names)
+lc_normal = [None] * len(planet_names)
+lc_superposition = [None] * len(planet_names)
+if not STREAMING:
+    for i, lc_c, error in fetch_many(star_names, workers=DOWNLOAD_WORKERS, reader=read_light_curves,
+                                     author='SPOC', cadence='short', offline=OFFLINE):
+        print(i)
+        if error is not None:
+            print(f'TIC {star_names[i]}: {error!r}')
+            failed.append(i)
+            continue
+        lc_collection[i], lc_normal[i], lc_superposition[i] = light_curve(star_names[i], orbital_periods[i], lc_c,
+                                                                          transits_duration[i])
+        if EXPORT_COLUMNAR:
+            export_collection(COLUMNAR_DIR, star_names[i], lc_c, np.float32 if COLUMNAR_FLOAT32 else np.float64)
+
+#%%
+"""
+Modo setor a setor. As threads apenas baixam os arquivos e cada alvo é lido um setor
+por vez e somado às partições de fase do período orbital, sem montar a curva completa
+(lc_collection e lc_normal ficam vazias e nada é exportado para o armazenamento
+colunar, então a busca incremental e a busca em lote não são feitas nesse modo). A curva sobreposta é a média por partição, centrada no trânsito.
+"""
+if STREAMING:
+    for i, paths, error in fetch_many(star_names, workers=DOWNLOAD_WORKERS, author='SPOC', cadence='short',
+                                      offline=OFFLINE):
+        print(i)
+        if error is not None:
+            print(f'TIC {star_names[i]}: {error!r}')
+            failed.append(i)
+            continue
+        lc_superposition[i] = profile_light_curve(stream_target(paths, orbital_periods[i])['fold'])
+
+# Alvos processados, usados pelas etapas seguintes
+targets = [i for i in range(len(planet_names)) if lc_superposition[i] is not None]
+
+#%%
+"""
+Busca de período incremental. Cada alvo tem um arquivo com as somas por partição de
+fase de todos os períodos teste. Apenas os setores que ainda não estão no arquivo são
+dobrados e somados, então um setor novo custa apenas os seus próprios pontos. Se com
+os setores novos a grade do arquivo ficou grossa demais para o tempo total (a
+sobreamostragem efetiva cai com T), o arquivo é refeito com uma grade nova e todos os
+setores.
+"""
+if INCREMENTAL_SEARCH and not STREAMING:
+    path_statistics = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'estatisticas')
+    os.makedirs(path_statistics, exist_ok=True)
+    incremental_periods = []
+    for i in range(len(planet_names)):
+        if i not in targets:
+            incremental_periods.append(None)
+            continue
+        file = os.path.join(path_statistics, f'TIC_{star_names[i]}.npz')
+        time_values = lc_normal[i].time.value
+        duration = transits_duration[i] / 24
+        total_time = np.max(time_values) - np.min(time_values)
+        if os.path.exists(file) and not grade_adequada(carregar_estatistica(file), duration, total_time):
+            os.remove(file)
+        if not os.path.exists(file):
+            # A grade é fixada na criação do arquivo, com o tempo total disponível até aqui
+            periods = grade_periodos(time_values, 0.5, 2 * orbital_periods[i], duration)
+            criar_estatistica(file, periods, epoca=time_values[0])
+        for lc in lc_collection[i]:
+            lc_sector = lc.normalize().remove_nans()
+            adicionar_setor(file, lc_sector.time.value, lc_sector.flux.value, setor=lc.sector)
+        incremental_periods.append(buscar_periodo_incremental(file)[0])
+
+#%%
+"""
+Busca de período em lote. As curvas de todos os alvos são concatenadas em um único
+vetor (com os deslocamentos de cada alvo) e dobradas com a mesma grade de períodos,
+sem um laço por alvo. Os períodos em que a curva dobrada de um alvo cobre menos que
+COVERAGE_MIN da fase (por causa das lacunas entre setores) ficam com NaN, e um alvo
+sem nenhum período com essa cobertura fica com período NaN em batch_periods. As curvas
+são lidas do armazenamento colunar (mapeadas na memória), então, depois de exportadas
+uma vez, esta etapa não precisa baixar nem ler nenhum arquivo FITS.
+"""
+if BATCH_SEARCH and not STREAMING:
+    curves = read_targets(COLUMNAR_DIR, [star_names[i] for i in targets])
+    time_flat, flux_flat, offsets = concatenar_curvas([curve['time'] for curve in curves],
+                                                      [curve['flux'] for curve in curves])
+    batch_periods, periods_grid, batch_lengths, lengths = minimizar_comprimento_multialvo(
+        time_flat, flux_flat, offsets, 0.5, 5.0, 0.001, cobertura_min=COVERAGE_MIN)
+    # Épocas de todos os alvos de uma vez, com os períodos e durações do catálogo
+    batch_epochs, batch_depths = epocas_transito(time_flat, flux_flat, offsets, np.asarray(orbital_periods)[targets],
+                                                 np.asarray(transits_duration)[targets] / 24)
+
 #%%
 plot_light_curve_superposition(lc_superposition, transits_duration, planet_names, orbital_periods, 
                                star_temperature, star_magnitudes)
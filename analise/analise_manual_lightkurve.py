@@ -21,10 +21,12 @@ import numpy as np # versão 1.26.4
 import matplotlib.pyplot as plt # versão 3.5.1
 import matplotlib.ticker as ticker # versão 3.5.1
 import pandas as pd # versão 2.2.1
-import scipy.spatial as ss # versão 1.8.0
 import math as mt # versão 3.10.12
 import os
 
+from fits_store import fetch_light_curves, read_light_curves
+from neighborhood import neighborhood
+
 #%%
 """
 Informações do exoplaneta que será analisado.
@@ -43,6 +45,7 @@ SHOW_PLOT = True
 SHOW_INFORMATION = False
 SHOW_ALTERNATIVE_METHOD = False
 DOWNLOAD_PLOT = False
+LOCAL_STORE = True # Curvas pelo armazenamento local (fits_store.py) em vez de baixar a cada execução
 
 #%%
 
@@ -50,12 +53,13 @@ DOWNLOAD_PLOT = False
 Função utilizada para pesquisar as curvas de luz disponíveis.
     * lk.search_lightcurve()
 """
-search_result = lk.search_lightcurve(f'TIC {exoplanet["TIC_ID"]}',    # ID do alvo
-                                      cadence ='short',     # ‘long’|‘short’|‘fast'|float
-                                      mission = 'TESS',     # Missão autora dos dados
-                                      author = 'SPOC',      # Cada autor usa uma grandeza de fluxo  
-                                      sector = exoplanet['sectors']    # quarter|sector|campaign
-                                      )
+if not LOCAL_STORE or SHOW_INFORMATION:
+    search_result = lk.search_lightcurve(f'TIC {exoplanet["TIC_ID"]}',    # ID do alvo
+                                          cadence ='short',     # ‘long’|‘short’|‘fast'|float
+                                          mission = 'TESS',     # Missão autora dos dados
+                                          author = 'SPOC',      # Cada autor usa uma grandeza de fluxo  
+                                          sector = exoplanet['sectors']    # quarter|sector|campaign
+                                          )
 
 if SHOW_INFORMATION:
     print(search_result) # Mostra a tabela com as informações da pesquisa
@@ -64,8 +68,14 @@ if SHOW_INFORMATION:
 """
 Função para fazer download de todas as curvas de luz encontradas. 
     *.download_all() 
-"""
-lc_collection = search_result.download_all()
+Com LOCAL_STORE os arquivos vêm do armazenamento local e só são baixados na primeira
+execução.
+"""
+if LOCAL_STORE:
+    lc_collection = read_light_curves(fetch_light_curves(exoplanet['TIC_ID'], author='SPOC', cadence='short',
+                                                         sectors=exoplanet['sectors']))
+else:
+    lc_collection = search_result.download_all()
 if SHOW_INFORMATION:
    print(lc_collection)
    print(f"Número de curvas de luz: {len(lc_collection)}")
@@ -328,26 +338,6 @@ if SHOW_ALTERNATIVE_METHOD:
         axs.set_xlim(-section, section) # Corte no eixo temporal
         plt.show()
         
-#%%
-"""
-Função qua irá analisar a vizinhança
-    ε > |p - p_o| tq ε > 0
-onde p e p_o pertencem a matriz 'points'. A funça tem que ser otimizada, pois como fuga
-para não analizar todos os pontos de 'points' foi estabelecido que se há 30 vizinhos 
-de p_o, então esse será o ponto escolhido.
-"""
-def neighborhood(points, radius):
-    best_point = None
-    for point in points:
-        # Calcular a distância de 'point' para todos os outros pontos
-        distances = ss.distance.cdist([point], points, 'euclidean').flatten()
-        # Contar quantos pontos estão dentro do raio (excluindo o próprio ponto)
-        neighbors = np.sum(distances < radius) - 1
-        if neighbors >= 10:  # Se um ponto tiver no mínimo 10 vizinhos, terminar a busca
-            best_point = point
-            break 
-    return best_point
-
 #%%
 """
 Formatação dos dados para que seja possível iterá-los. Além disso escrevemos a matriz
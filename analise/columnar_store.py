@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Armazenamento colunar das curvas de luz processadas. Depois de stitch().remove_nans()
+usamos apenas o tempo, o fluxo e o erro do fluxo, então em vez de guardar os objetos
+TessLightCurve (com dezenas de colunas e Quantity do astropy) cada alvo vira uma pasta
+com um arquivo .npy por coluna e um manifesto JSON:
+    TIC_<tic>/
+        manifest.json   colunas, tipos, número de pontos e o trecho de cada setor
+        time.npy        float64 (em float32 o BTJD teria precisão de ~20 s)
+        flux.npy        float32 ou float64
+        flux_err.npy    float32 ou float64
+Os setores ficam concatenados em ordem, e o trecho [start, stop) de cada um está no
+manifesto. A leitura usa np.load com mmap_mode='r': nada é lido até ser usado e
+recortar um setor não copia os dados, então a busca de período e os gráficos podem
+abrir milhares de curvas sem ler nenhum arquivo FITS. Uso:
+    from columnar_store import export_collection, read_target
+    export_collection(COLUMNAR_DIR, 190998418, lc_collection)
+    columns, manifest = read_target(COLUMNAR_DIR, 190998418)
+"""
+#%%
+import os
+import sys
+import json
+import numpy as np
+
+# Gravação atômica da pasta 'periodicidade'
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'periodicidade'))
+from gravacao import gravar_atomico
+
+#%%
+"""
+Configurações. O diretório pode ser trocado pela variável de ambiente
+LIGHT_CURVES_COLUMNAR.
+"""
+COLUMNAR_DIR = os.environ.get('LIGHT_CURVES_COLUMNAR',
+                              os.path.join(os.path.expanduser('~'), '.cache', 'light-curves', 'columnar'))
+COLUMNS = ('time', 'flux', 'flux_err')
+FORMAT_VERSION = 1
+
+def target_dir(root, tic):
+    return os.path.join(root, f'TIC_{int(tic)}')
+
+#%%
+"""
+Função que grava um alvo a partir dos vetores de cada setor. O manifesto é gravado por
+último e cada arquivo é gravado de forma atômica (gravacao.py), então uma gravação
+interrompida nunca deixa um manifesto apontando para colunas incompletas.
+"""
+def write_target(root, tic, sectors, times, fluxes, flux_errs, dtype=np.float32):
+    directory = target_dir(root, tic)
+    os.makedirs(directory, exist_ok=True)
+    order = np.argsort(sectors, kind='stable')
+    lengths = [len(times[k]) for k in order]
+    stops = np.cumsum(lengths)
+    columns = {
+        'time': np.concatenate([np.asarray(times[k], dtype=np.float64) for k in order]),
+        'flux': np.concatenate([np.asarray(fluxes[k], dtype=dtype) for k in order]),
+        'flux_err': np.concatenate([np.asarray(flux_errs[k], dtype=dtype) for k in order]),
+        }
+    for name, values in columns.items():
+        gravar_atomico(os.path.join(directory, name + '.npy'), lambda temporary: np.save(temporary, values))
+    manifest = {
+        'format': FORMAT_VERSION,
+        'tic': int(tic),
+        'length': int(stops[-1]) if len(stops) else 0,
+        'columns': {name: values.dtype.str for name, values in columns.items()},
+        'sectors': [{'sector': int(sectors[k]), 'start': int(stop - length), 'stop': int(stop)}
+                    for k, length, stop in zip(order, lengths, stops)],
+        }
+    def write_manifest(temporary):
+        with open(temporary, 'w') as file:
+            json.dump(manifest, file, indent=1)
+    gravar_atomico(os.path.join(directory, 'manifest.json'), write_manifest)
+    return manifest
+
+#%%
+"""
+Exportação de uma coleção do lightkurve. Cada setor é normalizado e tem os NaN
+removidos, como em lc_collection.stitch().remove_nans(), então ler o alvo inteiro
+devolve a mesma curva que o stitch.
+"""
+def export_collection(root, tic, lc_collection, dtype=np.float32):
+    sectors, times, fluxes, flux_errs = [], [], [], []
+    for lc in lc_collection:
+        lc = lc.normalize().remove_nans()
+        sectors.append(lc.sector)
+        times.append(lc.time.value)
+        fluxes.append(lc.flux.value)
+        flux_errs.append(lc.flux_err.value)
+    return write_target(root, tic, sectors, times, fluxes, flux_errs, dtype)
+
+#%%
+"""
+Funções de leitura. read_target devolve um dicionário com as colunas (mapeadas na
+memória quando mmap=True) e o manifesto; com 'sectors' apenas os setores pedidos são
+devolvidos (um recorte sem cópia quando os setores são consecutivos).
+"""
+def read_manifest(root, tic):
+    with open(os.path.join(target_dir(root, tic), 'manifest.json')) as file:
+        manifest = json.load(file)
+    if manifest['format'] != FORMAT_VERSION:
+        raise ValueError(f"TIC {tic}: formato {manifest['format']} não suportado")
+    return manifest
+
+def read_target(root, tic, sectors=None, mmap=True):
+    manifest = read_manifest(root, tic)
+    directory = target_dir(root, tic)
+    columns = {name: np.load(os.path.join(directory, name + '.npy'), mmap_mode='r' if mmap else None)
+               for name in manifest['columns']}
+    if sectors is not None:
+        sectors = {int(sector) for sector in sectors}
+        chosen = [s for s in manifest['sectors'] if s['sector'] in sectors]
+        contiguous = all(a['stop'] == b['start'] for a, b in zip(chosen, chosen[1:]))
+        if contiguous:
+            start, stop = (chosen[0]['start'], chosen[-1]['stop']) if chosen else (0, 0)
+            columns = {name: values[start:stop] for name, values in columns.items()}
+        else:
+            columns = {name: np.concatenate([values[s['start']:s['stop']] for s in chosen])
+                       for name, values in columns.items()}
+        manifest = dict(manifest, sectors=chosen, length=sum(s['stop'] - s['start'] for s in chosen))
+    return columns, manifest
+
+def read_targets(root, tics, mmap=True):
+    return [read_target(root, tic, mmap=mmap)[0] for tic in tics]
+
+def list_targets(root):
+    if not os.path.isdir(root):
+        return []
+    return sorted(int(name[len('TIC_'):]) for name in os.listdir(root)
+                  if name.startswith('TIC_') and os.path.exists(os.path.join(root, name, 'manifest.json')))
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Armazenamento local dos arquivos FITS das curvas de luz. Cada arquivo é guardado uma
+única vez, com o nome dado pelo hash (SHA-256) do seu conteúdo, e um índice SQLite
+relaciona cada chave (TIC, setor, autor, cadência) ao arquivo correspondente. Com o
+índice, rodar a análise de novo custa apenas a leitura dos arquivos em disco:
+    * o arquivo só é baixado quando a chave ainda não está no índice;
+    * a pesquisa no arquivo (MAST) só é refeita quando a última pesquisa do alvo tem
+      mais de SEARCH_MAX_AGE segundos;
+    * no modo offline (OFFLINE = True ou a variável de ambiente LIGHT_CURVES_OFFLINE=1)
+      a rede nunca é usada e apenas os arquivos locais são devolvidos.
+Quando o tamanho total passa do limite, os arquivos usados há mais tempo são apagados
+(LRU). A fonte dos arquivos é uma função 'archive'; mast_archive() usa o lightkurve e
+local_archive() lê uma pasta de arquivos FITS, para testar o código sem acesso à rede.
+Uso:
+    from fits_store import fetch_light_curves, read_light_curves
+    lc_collection = read_light_curves(fetch_light_curves(190998418, author='SPOC', cadence='short'))
+"""
+#%%
+import os
+import re
+import sys
+import json
+import time
+import random
+import sqlite3
+import hashlib
+import tempfile
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor, as_completed
+# O lightkurve só é necessário para o MAST e para ler os arquivos; o armazenamento e a
+# fonte local funcionam sem ele
+try:
+    import lightkurve as lk # versão 2.4.2
+except ImportError:
+    lk = None
+
+# Gravação atômica da pasta 'periodicidade'
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'periodicidade'))
+from gravacao import gravar_atomico
+
+#%%
+"""
+Configurações do armazenamento. O diretório pode ser trocado pela variável de ambiente
+LIGHT_CURVES_FITS.
+"""
+STORE_DIR = os.environ.get('LIGHT_CURVES_FITS',
+                           os.path.join(os.path.expanduser('~'), '.cache', 'light-curves', 'fits'))
+STORE_BUDGET = 20 * 1024**3 # 20 GB
+SEARCH_MAX_AGE = 7 * 24 * 3600 # Uma semana
+OFFLINE = os.environ.get('LIGHT_CURVES_OFFLINE', '0') == '1'
+DOWNLOAD_WORKERS = 8 # Downloads simultâneos (o MAST limita o número de conexões por usuário)
+
+#%%
+"""
+Índice SQLite. A tabela 'files' guarda o tamanho e o último acesso de cada arquivo,
+'entries' relaciona as chaves aos arquivos e 'searches' guarda quando cada alvo foi
+pesquisado e quais setores a fonte ofereceu (lista JSON). Cada chamada abre a sua própria conexão, então as funções podem ser usadas
+por várias threads ao mesmo tempo.
+"""
+def connect(store_dir=STORE_DIR):
+    os.makedirs(store_dir, exist_ok=True)
+    connection = sqlite3.connect(os.path.join(store_dir, 'index.sqlite'), timeout=60)
+    connection.executescript('''
+        CREATE TABLE IF NOT EXISTS files (
+            sha256 TEXT PRIMARY KEY, size INTEGER NOT NULL, last_access REAL NOT NULL);
+        CREATE TABLE IF NOT EXISTS entries (
+            tic INTEGER NOT NULL, sector INTEGER NOT NULL, author TEXT NOT NULL, cadence TEXT NOT NULL,
+            sha256 TEXT NOT NULL REFERENCES files(sha256),
+            PRIMARY KEY (tic, sector, author, cadence));
+        CREATE TABLE IF NOT EXISTS searches (
+            tic INTEGER NOT NULL, author TEXT NOT NULL, cadence TEXT NOT NULL, searched_at REAL NOT NULL,
+            sectors TEXT NOT NULL, PRIMARY KEY (tic, author, cadence));
+        ''')
+    # Índices antigos não guardavam os setores de cada pesquisa; as pesquisas são apenas
+    # um cache e são refeitas
+    if 'sectors' not in [column[1] for column in connection.execute('PRAGMA table_info(searches)')]:
+        connection.executescript('''
+            DROP TABLE searches;
+            CREATE TABLE searches (
+                tic INTEGER NOT NULL, author TEXT NOT NULL, cadence TEXT NOT NULL, searched_at REAL NOT NULL,
+                sectors TEXT NOT NULL, PRIMARY KEY (tic, author, cadence));
+            ''')
+    return connection
+
+def object_path(store_dir, sha256):
+    return os.path.join(store_dir, 'objects', sha256[:2], sha256 + '.fits')
+
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(2**20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+#%%
+"""
+Função que adiciona um arquivo FITS ao armazenamento e o associa à chave. Se o mesmo
+conteúdo já estiver guardado (por outra chave) o arquivo não é copiado de novo.
+"""
+def put_file(path, tic, sector, author, cadence, store_dir=STORE_DIR):
+    sha256 = file_hash(path)
+    destination = object_path(store_dir, sha256)
+    if not os.path.exists(destination):
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        def copy(temporary):
+            with open(path, 'rb') as source, open(temporary, 'wb') as target:
+                for block in iter(lambda: source.read(2**20), b''):
+                    target.write(block)
+        gravar_atomico(destination, copy)
+    with closing(connect(store_dir)) as connection, connection:
+        connection.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?)',
+                           (sha256, os.path.getsize(destination), time.time()))
+        connection.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)',
+                           (int(tic), int(sector), author, cadence, sha256))
+    return destination
+
+#%%
+"""
+Função que devolve os caminhos locais das chaves de um alvo (opcionalmente apenas dos
+setores pedidos), em ordem de setor, e marca os arquivos como usados recentemente.
+"""
+def local_entries(tic, author, cadence, sectors=None, store_dir=STORE_DIR):
+    with closing(connect(store_dir)) as connection, connection:
+        rows = connection.execute('SELECT sector, sha256 FROM entries WHERE tic = ? AND author = ? AND cadence = ? '
+                                  'ORDER BY sector', (int(tic), author, cadence)).fetchall()
+        rows = [(sector, sha256) for sector, sha256 in rows
+                if (sectors is None or sector in sectors) and os.path.exists(object_path(store_dir, sha256))]
+        connection.executemany('UPDATE files SET last_access = ? WHERE sha256 = ?',
+                               [(time.time(), sha256) for _, sha256 in rows])
+    return {sector: object_path(store_dir, sha256) for sector, sha256 in rows}
+
+#%%
+"""
+Funções para limitar o tamanho e inspecionar o armazenamento. Os arquivos em 'keep'
+(por exemplo os que acabaram de ser pedidos) nunca são apagados. A pesquisa dos alvos
+que perdem um arquivo também é apagada, para que a próxima chamada pesquise de novo.
+"""
+def evict(budget=STORE_BUDGET, store_dir=STORE_DIR, keep=()):
+    keep = set(keep)
+    with closing(connect(store_dir)) as connection, connection:
+        files = connection.execute('SELECT sha256, size FROM files ORDER BY last_access').fetchall()
+        total = sum(size for _, size in files)
+        for sha256, size in files:
+            if total <= budget:
+                break
+            if sha256 in keep:
+                continue
+            connection.execute('DELETE FROM searches WHERE (tic, author, cadence) IN '
+                               '(SELECT tic, author, cadence FROM entries WHERE sha256 = ?)', (sha256,))
+            connection.execute('DELETE FROM entries WHERE sha256 = ?', (sha256,))
+            connection.execute('DELETE FROM files WHERE sha256 = ?', (sha256,))
+            if os.path.exists(object_path(store_dir, sha256)):
+                os.remove(object_path(store_dir, sha256))
+            total -= size
+
+def store_info(store_dir=STORE_DIR):
+    with closing(connect(store_dir)) as connection:
+        num_files, total = connection.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM files').fetchone()
+        num_entries, num_targets = connection.execute('SELECT COUNT(*), COUNT(DISTINCT tic) FROM entries').fetchone()
+    return {'store_dir': store_dir, 'num_files': num_files, 'size_bytes': total,
+            'num_entries': num_entries, 'num_targets': num_targets}
+
+#%%
+"""
+Fontes dos arquivos. Uma fonte é uma função (tic, author, cadence) que devolve uma
+lista de produtos {'sector', 'fetch'}, onde fetch(directory) grava o arquivo FITS
+em directory e devolve o seu caminho.
+    * mast_archive: pesquisa e download pelo lightkurve (MAST);
+    * local_archive: uma pasta com arquivos tic<TIC>_s<setor>_<autor>_<cadência>.fits,
+      que substitui o MAST em testes e em máquinas sem acesso à rede.
+As fontes podem ser chamadas por várias threads ao mesmo tempo (fetch_many).
+"""
+def mast_archive(mission='TESS'):
+    def search(tic, author, cadence):
+        search_result = lk.search_lightcurve(f'TIC {tic}', cadence=cadence, mission=mission, author=author)
+        products = []
+        for i in range(len(search_result)):
+            row = search_result[i]
+            products.append({
+                'sector': int(search_result.table['sequence_number'][i]),
+                'fetch': lambda directory, row=row: row.download(download_dir=directory).meta['FILENAME'],
+                })
+        return products
+    return search
+
+def local_archive(root):
+    pattern = re.compile(r'tic(\d+)_s(\d+)_(.+)_([^_]+)\.fits$')
+    def search(tic, author, cadence):
+        products = []
+        for name in sorted(os.listdir(root)):
+            match = pattern.match(name)
+            if match and (int(match[1]), match[3], match[4]) == (int(tic), author, cadence):
+                products.append({'sector': int(match[2]), 'fetch': lambda directory, name=name: os.path.join(root, name)})
+        return products
+    return search
+
+#%%
+"""
+Função principal: devolve os caminhos locais dos arquivos FITS de um alvo, baixando
+apenas os setores que ainda não estão no armazenamento. A pesquisa na fonte guarda os
+setores oferecidos e é reaproveitada por SEARCH_MAX_AGE segundos, mas só enquanto
+todos esses setores (ou os pedidos em 'sectors') estiverem no disco; se faltar algum,
+por exemplo depois de uma chamada com apenas alguns setores ou de evict(), a fonte é
+pesquisada de novo. refresh=True sempre pesquisa.
+"""
+def fetch_light_curves(tic, author='SPOC', cadence='short', sectors=None, archive=None, offline=OFFLINE,
+                       refresh=False, store_dir=STORE_DIR, budget=STORE_BUDGET):
+    if sectors is not None:
+        sectors = {int(sector) for sector in sectors}
+    local = local_entries(tic, author, cadence, sectors, store_dir)
+    if offline:
+        return [local[sector] for sector in sorted(local)]
+
+    with closing(connect(store_dir)) as connection:
+        searched = connection.execute('SELECT searched_at, sectors FROM searches '
+                                      'WHERE tic = ? AND author = ? AND cadence = ?',
+                                      (int(tic), author, cadence)).fetchone()
+    if searched is not None and time.time() - searched[0] < SEARCH_MAX_AGE:
+        offered = set(json.loads(searched[1]))
+        complete = (offered if sectors is None else offered & sectors) <= set(local)
+    else:
+        complete = sectors is not None and sectors <= set(local)
+    if refresh or not complete:
+        archive = mast_archive() if archive is None else archive
+        listed = archive(tic, author, cadence)
+        products = [p for p in listed if sectors is None or p['sector'] in sectors]
+        with tempfile.TemporaryDirectory() as directory:
+            for product in products:
+                if product['sector'] not in local:
+                    path = put_file(product['fetch'](directory), tic, product['sector'], author, cadence, store_dir)
+                    local[product['sector']] = path
+        with closing(connect(store_dir)) as connection, connection:
+            connection.execute('INSERT OR REPLACE INTO searches VALUES (?, ?, ?, ?, ?)',
+                               (int(tic), author, cadence, time.time(),
+                                json.dumps(sorted({p['sector'] for p in listed}))))
+        evict(budget, store_dir, keep=[os.path.basename(path)[:-len('.fits')] for path in local.values()])
+    return [local[sector] for sector in sorted(local)]
+
+#%%
+"""
+Leitura dos arquivos locais como uma coleção de curvas de luz do lightkurve, no mesmo
+formato de search_result.download_all().
+"""
+def read_light_curves(paths):
+    return lk.LightCurveCollection([lk.read(path) for path in paths])
+
+#%%
+"""
+Etapa de download de vários alvos. Como o tempo é quase todo de espera pela rede e pelo
+disco, os alvos são buscados por um conjunto de até 'workers' threads, e cada alvo é
+entregue assim que fica pronto (em qualquer ordem), sem esperar pelo resto da lista:
+    for i, paths, error in fetch_many(star_names):
+        ...
+Uma busca que falha é repetida até 'retries' vezes, esperando backoff, 2*backoff,
+4*backoff... segundos (com uma variação aleatória para que as threads não voltem
+juntas). Se a última tentativa falhar o alvo é entregue com o erro (e None no lugar
+do resultado) e os demais alvos continuam; como os setores já baixados ficam no
+armazenamento, rodar de novo baixa apenas o que falta. Com 'reader' (por exemplo
+read_light_curves) a leitura dos arquivos também é feita na thread e o resultado da
+leitura é entregue no lugar dos caminhos.
+"""
+def fetch_with_retry(tic, retries=3, backoff=2.0, **kwargs):
+    for attempt in range(retries + 1):
+        try:
+            return fetch_light_curves(tic, **kwargs)
+        except Exception as error:
+            if attempt == retries:
+                raise
+            wait = backoff * 2**attempt * random.uniform(1.0, 1.5)
+            print(f'TIC {tic}: {error!r}; nova tentativa em {wait:.1f} s')
+            time.sleep(wait)
+
+def fetch_many(tics, workers=DOWNLOAD_WORKERS, retries=3, backoff=2.0, reader=None, **kwargs):
+    def task(tic):
+        paths = fetch_with_retry(tic, retries, backoff, **kwargs)
+        return paths if reader is None else reader(paths)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        tasks = {executor.submit(task, tic): i for i, tic in enumerate(tics)}
+        try:
+            for done in as_completed(tasks):
+                error = done.exception()
+                yield tasks[done], None if error is not None else done.result(), error
+        finally:
+            # Se o consumidor parar, as buscas que ainda não começaram são canceladas
+            for pending in tasks:
+                pending.cancel()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Busca do ponto de referência do trânsito na curva dobrada. Os pontos (tempo, fluxo)
+vêm em ordem crescente de fluxo e o escolhido é o primeiro que tem pelo menos
+'min_neighbors' vizinhos a uma distância menor que 'radius' (sem contar ele mesmo).
+A versão original calculava, para cada ponto, a distância até todos os outros com
+ss.distance.cdist, O(N) por ponto e O(N²) no pior caso. Aqui os pontos ficam em uma
+árvore (scipy.spatial.cKDTree) e as vizinhanças são contadas em lotes com
+query_ball_point(return_length=True), ~O(log N) por ponto. Uso:
+    from neighborhood import neighborhood
+    time_at_flux_min = neighborhood(points, radius)
+"""
+#%%
+import numpy as np
+import scipy.spatial as ss # versão 1.8.0
+
+#%%
+"""
+Função principal. Com 'scale' = (escala do tempo, escala do fluxo) cada eixo é
+dividido pela sua escala antes de medir a distância, então a vizinhança é uma elipse
+de semi-eixos radius*escala; com (1, 1) é o círculo da versão original.
+A árvore devolve os pontos a distância ≤ raio (e calcula a distância de outra forma),
+então as contagens são feitas com um raio um pouco maior e, na ordem dos pontos, cada
+candidato é confirmado com a mesma conta e a mesma desigualdade estrita da versão
+original: o ponto devolvido é sempre o mesmo.
+Como os pontos estão em ordem de fluxo, os vizinhos de um ponto estão entre os que têm
+fluxo menor que o dele mais o raio. Os primeiros 'direct' pontos são testados sem a
+árvore, apenas contra essa faixa de fluxo; depois os pontos são testados em lotes, que
+dobram de tamanho a cada passo, com uma árvore montada só com os pontos que podem ser
+vizinhos do lote (e remontada quando o lote passa dessa faixa). Em geral o ponto está
+entre os primeiros e a árvore nunca cobre a curva inteira. Retorna None se nenhum
+ponto tiver vizinhos suficientes.
+"""
+def neighborhood(points, radius, min_neighbors=10, scale=(1.0, 1.0), direct=16, batch=64):
+    original = np.asarray(points, dtype=float)
+    points = original / np.asarray(scale, dtype=float)
+    num_points = len(points)
+    if num_points == 0:
+        return None
+    radius_loose = radius * (1 + 1e-9) + 1e-300
+    flux = points[:, 1]
+    if np.all(flux[1:] >= flux[:-1]):
+        window = lambda k: (np.searchsorted(flux, flux[k] - radius_loose, 'left'),
+                            np.searchsorted(flux, flux[k] + radius_loose, 'right'))
+    else:
+        window = lambda k: (0, num_points)
+
+    for k in range(min(direct, num_points)):
+        lo, hi = window(k)
+        distances = np.sqrt(np.sum((points[lo:hi] - points[k])**2, axis=1))
+        if np.sum(distances < radius) - 1 >= min_neighbors:
+            return original[k]
+
+    start = min(direct, num_points)
+    tree_size = 0
+    while start < num_points:
+        stop = min(start + batch, num_points)
+        end = window(stop - 1)[1]
+        if end > tree_size:
+            tree = ss.cKDTree(points[:end])
+            tree_size = end
+        counts = tree.query_ball_point(points[start:stop], radius_loose, return_length=True)
+        for k in np.flatnonzero(counts - 1 >= min_neighbors):
+            point = points[start + k]
+            candidates = points[tree.query_ball_point(point, radius_loose)]
+            distances = np.sqrt(np.sum((candidates - point)**2, axis=1))
+            if np.sum(distances < radius) - 1 >= min_neighbors:
+                return original[start + k]
+        start = stop
+        batch *= 2
+    return None
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Processamento das curvas de luz setor a setor. Em vez de baixar todos os setores,
+juntar tudo com stitch() e só então dobrar, cada setor é lido, normalizado, limpo
+(NaN e cadências marcadas pelo indicador de qualidade) e somado a acumuladores de
+partições de fase (os mesmos de busca_incremental.py), e então descartado. A memória
+usada é a de um setor mais a dos acumuladores, qualquer que seja o número de setores
+do alvo. As etapas são geradores que podem ser encadeados e testados separadamente:
+    paths -> read_sectors -> sector_arrays -> clean_sectors -> accumulate_sectors
+Cada etapa intermediária recebe e entrega dicionários com as colunas de um setor
+('sector', 'time', 'flux', 'flux_err', 'quality'). Uso:
+    result = stream_target(fetch_light_curves(190998418), orbital_period=2.879)
+    phase, flux, counts = transit_profile(result['fold'])
+"""
+#%%
+import os
+import sys
+import numpy as np
+# O lightkurve só é necessário para ler os arquivos FITS e montar a LightCurve do
+# perfil; as etapas de limpeza e acumulação usam apenas numpy
+try:
+    import lightkurve as lk # versão 2.4.2
+except ImportError:
+    lk = None
+
+# Acumuladores da pasta 'periodicidade'
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'periodicidade'))
+from busca_incremental import nova_estatistica, acumular_pontos
+
+#%%
+"""
+Configurações. QUALITY_BITMASK é a máscara padrão do lightkurve para o TESS (cadências
+com manobras, descargas de momento, etc.); sem o lightkurve usamos os bits dessa
+máscara (1 | 2 | 4 | 8 | 32 | 128 = 175). BIN_WIDTH é a largura das partições da
+curva dobrada no período orbital.
+"""
+QUALITY_BITMASK = lk.utils.TessQualityFlags.DEFAULT_BITMASK if lk is not None else 175
+BIN_WIDTH = 10 / 1440 # 10 minutos (dias)
+
+#%%
+"""
+Etapas de leitura: um arquivo FITS por vez, e as colunas de cada setor como vetores.
+O arquivo é lido sem a máscara de qualidade para que a limpeza fique toda em
+clean_sectors.
+"""
+def read_sectors(paths):
+    for path in paths:
+        yield lk.read(path, quality_bitmask='none')
+
+def sector_arrays(light_curves):
+    for lc in light_curves:
+        yield {
+            'sector': lc.sector,
+            'time': np.asarray(lc.time.value, dtype=float),
+            'flux': np.ma.filled(np.asarray(lc.flux.value, dtype=float), np.nan),
+            'flux_err': np.ma.filled(np.asarray(lc.flux_err.value, dtype=float), np.nan),
+            'quality': np.asarray(lc.quality.value, dtype=np.int64),
+            }
+
+#%%
+"""
+Etapa de limpeza: remove as cadências marcadas em 'bitmask' e as que têm tempo ou
+fluxo NaN, e divide fluxo e erro pela mediana do setor (como lc.normalize()). Setores
+sem nenhuma cadência válida são pulados.
+"""
+def clean_sectors(sectors, bitmask=QUALITY_BITMASK):
+    for sector in sectors:
+        good = np.isfinite(sector['time']) & np.isfinite(sector['flux'])
+        if bitmask:
+            good &= (sector['quality'] & bitmask) == 0
+        if not np.any(good):
+            continue
+        median = np.median(sector['flux'][good])
+        yield {
+            'sector': sector['sector'],
+            'time': sector['time'][good],
+            'flux': sector['flux'][good] / median,
+            'flux_err': sector['flux_err'][good] / median,
+            'quality': sector['quality'][good],
+            }
+
+#%%
+"""
+Etapa de acumulação. Os acumuladores são estatísticas de busca_incremental.py:
+    * 'fold': um único período (o orbital) com partições de largura ~bin_width, que
+      dá a curva dobrada média sem guardar os pontos;
+    * 'search' (com 'periods'): a grade de períodos teste da busca incremental.
+A época é o primeiro tempo do primeiro setor. O gerador entrega os acumuladores após
+cada setor, então quem consome pode mostrar o progresso ou parar antes do fim; como
+as somas são combináveis (combinar_estatisticas), alvos com muitos setores também
+podem ser divididos entre processos.
+"""
+def accumulate_sectors(sectors, orbital_period, periods=None, bin_width=BIN_WIDTH, num_partitions=100):
+    accumulators = None
+    for sector in sectors:
+        if accumulators is None:
+            epoch = sector['time'][0]
+            num_bins = max(1, int(np.ceil(orbital_period / bin_width)))
+            accumulators = {'fold': nova_estatistica([orbital_period], epoch, num_bins), 'num_points': 0}
+            if periods is not None:
+                accumulators['search'] = nova_estatistica(periods, epoch, num_partitions)
+        for statistic in [accumulators['fold']] + ([accumulators['search']] if periods is not None else []):
+            acumular_pontos(statistic, sector['time'], sector['flux'])
+            if sector['sector'] is not None:
+                statistic['setores'] = np.append(statistic['setores'], sector['sector'])
+        accumulators['num_points'] += len(sector['time'])
+        yield accumulators
+
+#%%
+"""
+Pipeline completo de um alvo a partir dos caminhos dos arquivos FITS (por exemplo de
+fetch_light_curves). Devolve os acumuladores após o último setor.
+"""
+def stream_target(paths, orbital_period, periods=None, bin_width=BIN_WIDTH, bitmask=QUALITY_BITMASK):
+    accumulators = None
+    for accumulators in accumulate_sectors(clean_sectors(sector_arrays(read_sectors(paths)), bitmask),
+                                           orbital_period, periods, bin_width):
+        pass
+    if accumulators is None:
+        raise ValueError("Nenhum setor com cadências válidas")
+    return accumulators
+
+#%%
+"""
+Curva dobrada média centrada no trânsito, a partir do acumulador 'fold'. O centro é a
+partição de menor fluxo médio depois de uma média móvel (circular) de 'smooth'
+partições, ponderada pelo número de pontos, o que evita que uma partição isolada com
+ruído seja tomada pelo trânsito. Devolve a fase em dias, em [-P/2, P/2), o fluxo médio
+e o número de pontos de cada partição.
+"""
+def transit_profile(fold, smooth=3):
+    counts = fold['contagens'][0]
+    sums = fold['soma_fluxo'][0]
+    period = fold['periodos'][0]
+    num_bins = len(counts)
+    offsets = range(-(smooth // 2), smooth // 2 + 1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        smoothed = sum(np.roll(sums, k) for k in offsets) / sum(np.roll(counts, k) for k in offsets)
+        mean_flux = sums / counts
+    center = np.nanargmin(smoothed)
+    shift = np.roll(np.arange(num_bins), num_bins // 2 - center)
+    phase = (np.arange(num_bins) - num_bins // 2) * period / num_bins
+    return phase, mean_flux[shift], counts[shift]
+
+#%%
+"""
+Curva dobrada média no formato do lightkurve, para ser usada no lugar da curva
+sobreposta completa nos gráficos.
+"""
+def profile_light_curve(fold):
+    phase, flux, counts = transit_profile(fold)
+    valid = counts > 0
+    return lk.LightCurve(time=phase[valid], flux=flux[valid])
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Código para medir a curva de aceleração (speedup) da varredura paralela de períodos
+dos métodos de minimização e maximização do comprimento de corda. Para cada número de
+processos medimos o tempo da varredura e dividimos o tempo serial por ele.
+"""
+#%%
+import os
+import sys
+import time
+import numpy as np
+import matplotlib.pyplot as plt
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'periodicidade'))
+from motor_periodo import minimizar_comprimento_CL, maximizar_comprimento_CL
+
+#%%
+"""
+Variáveis de controle.
+"""
+SALVAR_RESULTADOS = True
+MOSTRAR_PLOT = True
+
+#%%
+"""
+Parâmetros do teste. Usamos a mesma curva de luz das simulações (5 dias com cadência
+de 30 segundos) e uma grade de períodos com passo mais grosso para o teste não demorar.
+"""
+dt = 0.00035
+tempo_max = 5.0
+tempo = np.arange(0, tempo_max, dt)
+profundidade = 0.01
+periodo = 1.0
+duracao = 0.1
+sigma = 0.001
+rng = np.random.default_rng(0)
+fluxo = 1 + rng.normal(0, sigma, len(tempo))
+fluxo[(tempo % periodo) < duracao] -= profundidade
+
+periodo_min = 0.5
+periodo_max = tempo_max
+dp = 0.005
+lista_workers = [1, 2, 4, 8, 16, 32, 64]
+lista_workers = [w for w in lista_workers if w <= (os.cpu_count() or 1)]
+
+#%%
+"""
+Medição dos tempos de cada método para cada número de processos.
+"""
+metodos = {'Minimização': minimizar_comprimento_CL, 'Maximização': maximizar_comprimento_CL}
+tempos = {nome: [] for nome in metodos}
+for nome, metodo in metodos.items():
+    for workers in lista_workers:
+        inicio = time.perf_counter()
+        metodo(tempo, fluxo, periodo_min, periodo_max, dp, workers=workers)
+        tempos[nome].append(time.perf_counter() - inicio)
+        print(f'{nome} | workers = {workers} | {tempos[nome][-1]:.2f} s')
+
+#%%
+if SALVAR_RESULTADOS:
+    with open('aceleracao_paralela.csv', 'w') as arquivo:
+        arquivo.write('metodo,workers,tempo_s,aceleracao\n')
+        for nome in metodos:
+            for workers, t in zip(lista_workers, tempos[nome]):
+                arquivo.write(f'{nome},{workers},{t:.4f},{tempos[nome][0] / t:.3f}\n')
+
+#%%
+if MOSTRAR_PLOT:
+    plt.figure(figsize=(8, 6), dpi=200)
+    for nome in metodos:
+        plt.plot(lista_workers, tempos[nome][0] / np.array(tempos[nome]), 'o-', label=nome)
+    plt.plot(lista_workers, lista_workers, 'k--', alpha=0.5, label='Ideal')
+    plt.xlabel('Número de processos')
+    plt.ylabel('Aceleração')
+    plt.title('Aceleração da Varredura Paralela de Períodos')
+    plt.legend()
+    plt.show()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Código para comparar o tempo de dobragem da curva de luz por np.argsort (dobrar_CL)
+com a intercalação das sequências já ordenadas de cada ciclo (dobrar_CL_corridas),
+com e sem a ordem do período teste anterior, para N de 10^4 até 10^7 pontos.
+"""
+#%%
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'periodicidade'))
+from motor_periodo import dobrar_CL, dobrar_CL_corridas
+
+#%%
+"""
+Parâmetros do teste. Usamos um setor do TESS (27 dias) amostrado com N pontos e um
+período teste de 1.2345 dias, ou seja, cerca de 22 ciclos sobrepostos.
+"""
+tempo_total = 27.0
+periodo = 1.2345
+dp = 1e-5 # Distância até o período teste anterior (para a ordem inicial)
+lista_N = [10**4, 10**5, 10**6, 10**7]
+repeticoes = 3
+
+#%%
+def menor_tempo(funcao):
+    melhor = np.inf
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+#%%
+print(f'{"N":>10} | {"argsort":>10} | {"corridas":>10} | {"anterior":>10} | aceleração')
+for N in lista_N:
+    tempo = np.linspace(0, tempo_total, N)
+    fluxo = np.random.default_rng(0).normal(1, 0.001, N)
+    _, _, ordem_anterior = dobrar_CL_corridas(tempo, fluxo, periodo - dp, retornar_ordem=True)
+    t_argsort = menor_tempo(lambda: dobrar_CL(tempo, fluxo, periodo))
+    t_corridas = menor_tempo(lambda: dobrar_CL_corridas(tempo, fluxo, periodo))
+    t_anterior = menor_tempo(lambda: dobrar_CL_corridas(tempo, fluxo, periodo, ordem_anterior))
+    print(f'{N:>10} | {t_argsort:>10.5f} | {t_corridas:>10.5f} | {t_anterior:>10.5f} | {t_argsort / t_corridas:.2f}x')
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Código para comparar a busca do ponto de referência do trânsito com ss.distance.cdist
+(um ponto por vez contra todos os outros, como era feito nos códigos de análise) com a
+busca pela árvore cKDTree de analise/neighborhood.py, em curvas dobradas com 1 a 13
+setores do TESS (cadência de 2 minutos). Os dois métodos precisam devolver o mesmo
+ponto.
+"""
+#%%
+import os
+import sys
+import time
+import numpy as np
+import scipy.spatial as ss
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'periodicidade'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'analise'))
+from simulacao import gerar_curvas, tempo_tess
+from neighborhood import neighborhood
+
+#%%
+"""
+Parâmetros do teste. A curva é dobrada no período e o raio é estimado como nos códigos
+de análise (a potência de 10 da diferença entre o fluxo médio e o mínimo). Uma fração
+dos pontos vira outlier abaixo da curva (raios cósmicos, descargas de momento), como
+nas curvas reais: os outliers isolados vêm primeiro na ordem de fluxo e não têm
+vizinhos, e é nesse caso que a busca percorre muitos pontos.
+"""
+periodo = 2.879
+profundidade = 0.01
+duracao = 0.12
+sigma = 0.002
+lista_setores = [1, 4, 13]
+lista_outliers = [0.0, 0.002, 0.01]
+repeticoes = 3
+semente = 0
+
+#%%
+def neighborhood_cdist(points, radius):
+    for point in points:
+        distances = ss.distance.cdist([point], points, 'euclidean').flatten()
+        if np.sum(distances < radius) - 1 >= 10:
+            return point
+    return None
+
+def menor_tempo(funcao):
+    melhor = np.inf
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor, resultado
+
+#%%
+rng = np.random.default_rng(semente)
+print(f'{"setores":>8} | {"N":>8} | {"outliers":>8} | {"cdist":>10} | {"cKDTree":>10} | aceleração | mesmo ponto')
+for num_setores in lista_setores:
+    for fracao_outliers in lista_outliers:
+        tempo = tempo_tess(num_setores)
+        fluxo = gerar_curvas(tempo, profundidade, duracao, periodo, sigma, rng=rng)[0]
+        outliers = rng.random(len(fluxo)) < fracao_outliers
+        fluxo[outliers] -= rng.uniform(0, 5 * profundidade, np.sum(outliers))
+        fase = tempo % periodo
+        points = np.column_stack((fase, fluxo))[np.argsort(fluxo)]
+        a = np.mean(fluxo) - np.min(fluxo)
+        radius = 10.0**np.floor(np.log10(a))
+        t_cdist, ponto_cdist = menor_tempo(lambda: neighborhood_cdist(points, radius))
+        t_arvore, ponto_arvore = menor_tempo(lambda: neighborhood(points, radius))
+        print(f'{num_setores:>8} | {len(points):>8} | {fracao_outliers:>8} | {t_cdist:9.4f}s | {t_arvore:9.4f}s | '
+              f'{t_cdist / t_arvore:9.1f}x | {np.array_equal(ponto_cdist, ponto_arvore)}')
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Suíte de benchmark dos métodos de determinação de período. Para cada combinação de
+número de pontos (N), tamanho da grade de períodos, nível de ruído e forma do trânsito
+medimos o tempo de execução, o pico de memória (tracemalloc) e o erro do período
+recuperado. Comparamos a minimização e a maximização do comprimento de corda com o
+stringlength_dat do PyAstronomy e com os periodogramas Lomb-Scargle e BLS do astropy.
+Os resultados são gravados em JSON e CSV para acompanhar regressões e acelerações ao
+longo do tempo.
+"""
+#%%
+import os
+import sys
+import csv
+import json
+import time
+import platform
+import subprocess
+import tracemalloc
+from datetime import datetime
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'periodicidade'))
+from motor_periodo import comprimentos_lote, comprimentos_representativos
+from simulacao import fluxo_ruidoso
+
+# Bibliotecas opcionais: os métodos sem a biblioteca instalada são pulados
+try:
+    from PyAstronomy import pyTiming as pyt
+except ImportError:
+    pyt = None
+try:
+    from astropy.timeseries import LombScargle, BoxLeastSquares
+except ImportError:
+    LombScargle = BoxLeastSquares = None
+
+#%%
+"""
+Variáveis de controle.
+"""
+SALVAR_RESULTADOS = True
+ARQUIVO_SAIDA = 'resultados_benchmark' # Gera resultados_benchmark.json e resultados_benchmark.csv
+
+#%%
+"""
+Parâmetros do teste. O tempo total é fixo (5 dias, como nas simulações) e N varia
+pela cadência. O tamanho da grade varia pelo passo dp entre períodos teste.
+"""
+tempo_max = 5.0
+profundidade = 0.01
+periodo = 1.0
+duracao = 0.1
+periodo_min = 0.5
+periodo_max = tempo_max
+lista_N = [2000, 5000, 14286] # 14286 pontos = cadência das simulações (≈ 30 segundos)
+lista_dp = [0.01, 0.001]
+lista_sigma = [0.001, 0.005]
+transitos = ['degrau', 'parabola', 'limbo', 'vazio']
+tolerancia = 0.01 # Erro relativo máximo para considerar o período recuperado
+repeticoes = 3
+semente = 0
+
+#%%
+"""
+Métodos comparados. Cada um recebe (tempo, fluxo, periodos) e devolve o período
+estimado.
+"""
+def minimizacao(tempo, fluxo, periodos):
+    return periodos[np.argmin(comprimentos_lote(tempo, fluxo, periodos))]
+
+def maximizacao(tempo, fluxo, periodos):
+    return periodos[np.argmax(comprimentos_representativos(tempo, fluxo, periodos))]
+
+def pyastronomy(tempo, fluxo, periodos):
+    p, sl = pyt.stringlength_dat(tempo, fluxo, periodos)
+    return p[np.argmin(sl)]
+
+def lomb_scargle(tempo, fluxo, periodos):
+    potencia = LombScargle(tempo, fluxo).power(1 / periodos)
+    return periodos[np.argmax(potencia)]
+
+def bls(tempo, fluxo, periodos):
+    resultado = BoxLeastSquares(tempo, fluxo).power(periodos, duracao)
+    return periodos[np.argmax(resultado.power)]
+
+metodos = {'minimizacao': minimizacao, 'maximizacao': maximizacao}
+if pyt is not None:
+    metodos['pyastronomy'] = pyastronomy
+if LombScargle is not None:
+    metodos['lomb_scargle'] = lomb_scargle
+    metodos['bls'] = bls
+
+#%%
+"""
+Função que mede um método: menor tempo entre as repetições e pico de memória de uma
+execução separada (o tracemalloc deixa o código mais lento, então não medimos os dois
+juntos).
+"""
+def medir(metodo, tempo, fluxo, periodos):
+    melhor = np.inf
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        periodo_estimado = metodo(tempo, fluxo, periodos)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    tracemalloc.start()
+    metodo(tempo, fluxo, periodos)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return float(periodo_estimado), melhor, pico
+
+#%%
+"""
+Informações do ambiente, gravadas junto com os resultados.
+"""
+def commit_atual():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ''
+
+ambiente = {
+    'data': datetime.now().isoformat(timespec='seconds'),
+    'commit': commit_atual(),
+    'python': platform.python_version(),
+    'numpy': np.__version__,
+    'plataforma': platform.platform(),
+    'processador': platform.processor(),
+    'num_cpus': os.cpu_count(),
+    'metodos': list(metodos),
+    }
+
+#%%
+"""
+Execução de todas as combinações.
+"""
+resultados = []
+rng = np.random.default_rng(semente)
+for N in lista_N:
+    tempo = np.linspace(0, tempo_max, N, endpoint=False)
+    for dp in lista_dp:
+        periodos = np.arange(periodo_min, periodo_max, dp)
+        for sigma in lista_sigma:
+            for transito in transitos:
+                fluxo = fluxo_ruidoso(tempo, profundidade, duracao, periodo, sigma, transito, rng=rng)
+                for nome, metodo in metodos.items():
+                    periodo_estimado, tempo_s, pico = medir(metodo, tempo, fluxo, periodos)
+                    erro = abs(periodo_estimado - periodo) / periodo
+                    resultados.append({
+                        'metodo': nome, 'N': N, 'num_periodos': len(periodos), 'dp': dp, 'sigma': sigma,
+                        'transito': transito, 'tempo_s': tempo_s, 'pico_memoria_bytes': pico,
+                        'periodo_estimado': periodo_estimado, 'erro_relativo': erro,
+                        # Sem trânsito não existe período a recuperar
+                        'recuperado': None if transito == 'vazio' else bool(erro <= tolerancia),
+                        })
+                    print(f'{nome:>12} | N = {N:>6} | P = {len(periodos):>5} | σ = {sigma} | {transito:>8} | '
+                          f'{tempo_s:8.4f} s | {pico / 2**20:8.1f} MB | P = {periodo_estimado:.4f}')
+
+#%%
+if SALVAR_RESULTADOS:
+    with open(ARQUIVO_SAIDA + '.json', 'w') as arquivo:
+        json.dump({'ambiente': ambiente, 'resultados': resultados}, arquivo, indent=2)
+    with open(ARQUIVO_SAIDA + '.csv', 'w', newline='') as arquivo:
+        escritor = csv.DictWriter(arquivo, fieldnames=list(resultados[0]))
+        escritor.writeheader()
+        escritor.writerows(resultados)
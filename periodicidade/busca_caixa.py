@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Busca de trânsitos por caixas (no estilo do BLS, Box Least Squares) sobre a curva de
+luz dobrada e particionada em fase. Para cada período teste os pontos são somados em M
+partições de fase (quantidade de pontos e soma do fluxo, com o fluxo médio subtraído)
+e, com as somas acumuladas (prefixos), a soma dentro de qualquer caixa de k partições
+começando em qualquer partição j sai de uma subtração:
+    n = C[j+k] - C[j],  s = S[j+k] - S[j]
+então todas as posições de uma largura custam O(M) por período. Como o fluxo médio é
+zero, a média fora da caixa é -s/(N-n) e
+    profundidade = -s*N / (n*(N-n)),  potência = s²*N / (n*(N-n))
+a potência é a redução do χ² ao trocar a reta pelo degrau, o sinal que o fluxo_ruidoso
+com trânsito em degrau simula. A busca devolve juntos o período, a época (centro do
+primeiro trânsito), a profundidade e a duração. Uso:
+    from busca_caixa import busca_caixa
+    periodo, epoca, profundidade, duracao, periodos, potencias = busca_caixa(tempo, fluxo, 0.5, 5.0, 0.001,
+                                                                             duracoes=[0.05, 0.1, 0.2])
+"""
+#%%
+import numpy as np
+
+from motor_periodo import MEMORIA_MAX, bloco_particoes, somas_particoes
+
+#%%
+"""
+Número de partições padrão: ao menos √N (como na CL representativa do método de
+maximização) e o suficiente para que a menor duração ocupe 4 partições no maior
+período teste.
+"""
+def particoes_padrao(num_pontos, periodo_max, duracao_min):
+    return int(max(np.sqrt(num_pontos), np.ceil(4 * periodo_max / duracao_min)))
+
+#%%
+"""
+Função que avalia um bloco de períodos teste. A quantidade de pontos e a soma do fluxo
+de cada partição vêm de somas_particoes (motor_periodo.py). As somas são duplicadas
+antes do acúmulo para que as caixas possam passar pela fase zero. Retorna, para cada
+período, a maior potência e a profundidade, a partição inicial e a largura (em
+partições) da caixa correspondente. Caixas com aumento de fluxo são ignoradas.
+"""
+def caixas_bloco(tempo, fluxo, periodos, duracoes, num_particoes, memoria_max=MEMORIA_MAX):
+    num_periodos = len(periodos)
+    num_pontos = len(tempo)
+    linhas = np.arange(num_periodos)[:, np.newaxis]
+    contagens, somas, _ = somas_particoes(tempo, fluxo, periodos, num_particoes, memoria_max)
+    zeros = np.zeros((num_periodos, 1))
+    C = np.concatenate((zeros, np.cumsum(np.concatenate((contagens, contagens), axis=1), axis=1)), axis=1)
+    S = np.concatenate((zeros, np.cumsum(np.concatenate((somas, somas), axis=1), axis=1)), axis=1)
+
+    melhor = np.full((4, num_periodos), -np.inf) # Potência, profundidade, início e largura
+    inicios = np.arange(num_particoes)[np.newaxis, :]
+    for duracao in duracoes:
+        # A largura em partições depende do período
+        larguras = np.clip(np.rint(duracao / periodos * num_particoes).astype(np.int64), 1, num_particoes - 1)
+        fins = inicios + larguras[:, np.newaxis]
+        n = np.take_along_axis(C, fins, axis=1) - C[:, :num_particoes]
+        s = np.take_along_axis(S, fins, axis=1) - S[:, :num_particoes]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            potencia = s*s * num_pontos / (n * (num_pontos - n))
+        potencia[~((n > 0) & (n < num_pontos) & (s < 0))] = -np.inf
+        j = np.argmax(potencia, axis=1)
+        potencia_max = potencia[linhas[:, 0], j]
+        n_max, s_max = n[linhas[:, 0], j], s[linhas[:, 0], j]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            profundidade = -s_max * num_pontos / (n_max * (num_pontos - n_max))
+        trocar = potencia_max > melhor[0]
+        melhor[:, trocar] = np.array([potencia_max, profundidade, j, larguras])[:, trocar]
+    return melhor
+
+#%%
+"""
+Função principal. Os períodos são avaliados em blocos limitados pela memória máxima
+(bloco_particoes, contando ~16 vetores de M elementos por período para as somas
+acumuladas e as caixas). A época é o centro da melhor caixa, levado para o primeiro
+trânsito dentro da curva de luz.
+"""
+def busca_caixa(tempo, fluxo, periodo_min, periodo_max, dp, duracoes, num_particoes=None,
+                memoria_max=MEMORIA_MAX, periodos=None):
+    tempo = np.asarray(tempo, dtype=float)
+    fluxo = np.asarray(fluxo, dtype=float)
+    fluxo = fluxo - np.mean(fluxo)
+    memoria_max -= fluxo.nbytes # A cópia do fluxo também ocupa a memória
+    duracoes = np.atleast_1d(np.asarray(duracoes, dtype=float))
+    if periodos is None:
+        periodos = np.arange(periodo_min, periodo_max, dp)
+    periodos = np.asarray(periodos, dtype=float)
+    if num_particoes is None:
+        num_particoes = particoes_padrao(len(tempo), np.max(periodos), np.min(duracoes))
+
+    resultados = np.empty((4, len(periodos)))
+    bloco = bloco_particoes(len(tempo), num_particoes, memoria_max, vetores_particao=16)
+    for inicio in range(0, len(periodos), bloco):
+        fim = min(inicio + bloco, len(periodos))
+        resultados[:, inicio:fim] = caixas_bloco(tempo, fluxo, periodos[inicio:fim], duracoes, num_particoes,
+                                                 memoria_max)
+    potencias = resultados[0]
+
+    indice_maior = np.argmax(potencias)
+    periodo = periodos[indice_maior]
+    _, profundidade, particao, largura = resultados[:, indice_maior]
+    duracao = largura * periodo / num_particoes
+    epoca = (particao + largura / 2) * periodo / num_particoes
+    epoca += periodo * np.ceil((np.min(tempo) - epoca) / periodo)
+    return periodo, epoca, profundidade, duracao, periodos, potencias
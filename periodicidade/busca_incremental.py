@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Busca de período incremental. Para cada período teste guardamos em disco, para cada
+partição de fase, a quantidade de pontos, a soma do fluxo e a soma do fluxo ao
+quadrado. Essas somas podem ser combinadas, então quando um novo setor do TESS é
+publicado basta dobrar apenas os pontos novos e somá-los às partições existentes: o
+custo da atualização é proporcional aos dados novos e não a todo o histórico.
+A fase é medida a partir de uma época fixa, escolhida na criação do arquivo, para
+que pontos de setores diferentes caiam nas mesmas partições. Uso:
+    criar_estatistica('alvo.npz', periodos, epoca=tempo[0])
+    adicionar_setor('alvo.npz', tempo_setor, fluxo_setor, setor=14)
+    periodo, periodos, theta, thetas = buscar_periodo_incremental('alvo.npz')
+As mesmas somas podem ficar apenas em memória (nova_estatistica e acumular_pontos) e
+estatísticas de partes diferentes dos dados podem ser juntadas (combinar_estatisticas).
+A grade de períodos fica fixa no arquivo, mas o passo necessário diminui com o tempo
+total da curva (δP ∝ 1/T, grade_periodos.py): a cada setor novo a sobreamostragem
+efetiva da grade cai. As somas não podem ser levadas para outra grade, então antes de
+adicionar setores que aumentam o tempo total é preciso verificar a grade
+(grade_adequada) e, se ela ficou grossa demais, criar o arquivo de novo com uma grade
+para o novo tempo total e somar todos os setores outra vez.
+"""
+#%%
+import numpy as np
+
+from gravacao import gravar_atomico
+from motor_periodo import MEMORIA_MAX, bloco_particoes, somas_particoes, theta_pdm
+
+#%%
+"""
+Funções que criam as somas zeradas para a grade de períodos teste, em memória
+(nova_estatistica) ou já gravadas no arquivo (criar_estatistica).
+"""
+def nova_estatistica(periodos, epoca, num_particoes=100):
+    periodos = np.asarray(periodos, dtype=float)
+    forma = (len(periodos), num_particoes)
+    return {
+        'periodos': periodos,
+        'epoca': np.float64(epoca),
+        'contagens': np.zeros(forma),
+        'soma_fluxo': np.zeros(forma),
+        'soma_fluxo2': np.zeros(forma),
+        'setores': np.zeros(0, dtype=np.int64),
+        }
+
+def criar_estatistica(caminho, periodos, epoca, num_particoes=100):
+    estatistica = nova_estatistica(periodos, epoca, num_particoes)
+    salvar_estatistica(caminho, estatistica)
+    return estatistica
+
+#%%
+"""
+Funções para ler e gravar as somas. A gravação é atômica (gravacao.py), então uma
+execução interrompida não corrompe o arquivo.
+"""
+def carregar_estatistica(caminho):
+    with np.load(caminho) as dados:
+        return {chave: dados[chave] for chave in dados.files}
+
+def salvar_estatistica(caminho, estatistica):
+    gravar_atomico(caminho, lambda temporario: np.savez(temporario, **estatistica))
+
+#%%
+"""
+Função que soma os pontos (tempo, fluxo) às partições de fase de todos os períodos
+teste. Os períodos são processados em blocos limitados pela memória máxima, e as
+somas de cada bloco saem de somas_particoes (motor_periodo.py).
+"""
+def acumular_pontos(estatistica, tempo, fluxo, memoria_max=MEMORIA_MAX):
+    tempo = np.asarray(tempo, dtype=float) - estatistica['epoca']
+    fluxo = np.asarray(fluxo, dtype=float)
+    periodos = estatistica['periodos']
+    num_particoes = estatistica['contagens'].shape[1]
+    bloco = bloco_particoes(len(tempo), num_particoes, memoria_max)
+    for inicio in range(0, len(periodos), bloco):
+        fim = inicio + bloco
+        contagens, soma, soma2 = somas_particoes(tempo, fluxo, periodos[inicio:fim], num_particoes, memoria_max)
+        estatistica['contagens'][inicio:fim] += contagens
+        estatistica['soma_fluxo'][inicio:fim] += soma
+        estatistica['soma_fluxo2'][inicio:fim] += soma2
+    return estatistica
+
+#%%
+"""
+Verificação da grade. A sobreamostragem efetiva de cada período teste é a razão entre
+P * duracao / T (o passo que desloca o trânsito de uma duração ao longo da curva) e o
+passo da grade; a grade é adequada se a menor delas for pelo menos SOBREAMOSTRAGEM_MIN. Com
+sobreamostragem 3 o mínimo já se perde (grade_periodos.py), então o limite padrão é 5:
+uma grade criada com o padrão 10 suporta até o dobro do tempo total da criação.
+"""
+SOBREAMOSTRAGEM_MIN = 5
+
+def sobreamostragem_efetiva(periodos, duracao, tempo_total):
+    periodos = np.asarray(periodos, dtype=float)
+    if len(periodos) < 2:
+        return np.inf
+    return np.min(periodos[:-1] * duracao / (tempo_total * np.diff(periodos)))
+
+def grade_adequada(estatistica, duracao, tempo_total, sobreamostragem_min=SOBREAMOSTRAGEM_MIN):
+    return sobreamostragem_efetiva(estatistica['periodos'], duracao, tempo_total) >= sobreamostragem_min
+
+#%%
+"""
+Função que adiciona um setor ao arquivo. Se o número do setor já estiver registrado
+o setor é ignorado, assim rodar o código de novo não soma os mesmos pontos duas vezes.
+"""
+def adicionar_setor(caminho, tempo, fluxo, setor=None, memoria_max=MEMORIA_MAX):
+    estatistica = carregar_estatistica(caminho)
+    if setor is not None:
+        if setor in estatistica['setores']:
+            return estatistica
+        estatistica['setores'] = np.append(estatistica['setores'], setor)
+    acumular_pontos(estatistica, tempo, fluxo, memoria_max)
+    salvar_estatistica(caminho, estatistica)
+    return estatistica
+
+#%%
+"""
+Função que junta duas estatísticas com a mesma grade, a mesma época e as mesmas
+partições (por exemplo calculadas em processos ou máquinas diferentes): as somas são
+somadas. Setores presentes nas duas seriam contados duas vezes, então isso é um erro.
+"""
+def combinar_estatisticas(a, b):
+    if (not np.array_equal(a['periodos'], b['periodos']) or a['epoca'] != b['epoca']
+            or a['contagens'].shape != b['contagens'].shape):
+        raise ValueError("As estatísticas têm grades, épocas ou partições diferentes")
+    if np.intersect1d(a['setores'], b['setores']).size:
+        raise ValueError("As estatísticas têm setores em comum")
+    return {
+        'periodos': a['periodos'],
+        'epoca': a['epoca'],
+        'contagens': a['contagens'] + b['contagens'],
+        'soma_fluxo': a['soma_fluxo'] + b['soma_fluxo'],
+        'soma_fluxo2': a['soma_fluxo2'] + b['soma_fluxo2'],
+        'setores': np.concatenate((a['setores'], b['setores'])),
+        }
+
+#%%
+"""
+Função que calcula, a partir das somas, a estatística de dispersão de fase (PDM, a
+mesma de theta_pdm em motor_periodo.py). No período real os pontos de cada partição
+têm fluxos parecidos e θ é mínimo. Diferente do comprimento das médias por partição,
+θ não favorece os múltiplos do período (em 3P o trânsito aparece 3 vezes na CL
+dobrada e o comprimento das médias é maior que em P).
+"""
+def theta_incremental(estatistica):
+    return theta_pdm(estatistica['contagens'], estatistica['soma_fluxo'], estatistica['soma_fluxo2'])
+
+#%%
+"""
+Função que devolve o período de menor θ, na mesma forma das funções de
+motor_periodo.py.
+"""
+def buscar_periodo_incremental(caminho):
+    estatistica = carregar_estatistica(caminho)
+    periodos = estatistica['periodos']
+    thetas = theta_incremental(estatistica)
+    indice_menor = np.nanargmin(thetas)
+    return periodos[indice_menor], periodos, thetas[indice_menor], thetas
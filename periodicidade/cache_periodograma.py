@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cache em disco dos resultados da busca de período. A chave de cada resultado é o hash
+(SHA-256) dos vetores de tempo e fluxo, do método, dos parâmetros da grade e da versão
+do código (o conteúdo de motor_periodo.py), então qualquer mudança nos dados, na grade
+ou no algoritmo gera uma chave nova. Os vetores de períodos e comprimentos são salvos
+em arquivos .npz comprimidos. Quando o tamanho total passa do limite, os arquivos
+usados há mais tempo são apagados (LRU, pela data de modificação, que é atualizada a
+cada leitura). Uso:
+    from cache_periodograma import periodograma_em_cache
+    periodo, periodos, comprimento, comprimentos = periodograma_em_cache('min', tempo, fluxo,
+                                                                       periodo_min, periodo_max, dp)
+"""
+#%%
+import os
+import glob
+import hashlib
+import numpy as np
+
+import motor_periodo
+from gravacao import gravar_atomico
+
+#%%
+"""
+Configurações do cache. O diretório pode ser trocado pela variável de ambiente
+LIGHT_CURVES_CACHE.
+"""
+DIRETORIO_CACHE = os.environ.get('LIGHT_CURVES_CACHE',
+                                 os.path.join(os.path.expanduser('~'), '.cache', 'light-curves', 'periodogramas'))
+LIMITE_CACHE = 2 * 1024**3 # 2 GB
+
+# Métodos disponíveis: função e se o período real é o mínimo ou o máximo
+METODOS = {
+    'min': (motor_periodo.minimizar_comprimento_CL, np.nanargmin), # NaN abaixo de cobertura_min
+    'max': (motor_periodo.maximizar_comprimento_CL, np.argmax),
+    'pdm': (motor_periodo.minimizar_pdm, np.nanargmin),
+    }
+
+#%%
+"""
+Versão do código: hash do arquivo com as funções da busca de período.
+"""
+def versao_codigo():
+    with open(motor_periodo.__file__, 'rb') as arquivo:
+        return hashlib.sha256(arquivo.read()).hexdigest()
+
+#%%
+"""
+Função que monta a chave do cache. Parâmetros que são vetores (por exemplo uma grade
+de períodos pronta) entram pelo hash do seu conteúdo.
+"""
+def chave_cache(metodo, tempo, fluxo, **parametros):
+    h = hashlib.sha256()
+    h.update(versao_codigo().encode())
+    h.update(metodo.encode())
+    for vetor in (tempo, fluxo):
+        vetor = np.ascontiguousarray(vetor, dtype=np.float64)
+        h.update(str(vetor.shape).encode())
+        h.update(vetor.tobytes())
+    for nome in sorted(parametros):
+        valor = parametros[nome]
+        h.update(nome.encode())
+        if isinstance(valor, np.ndarray):
+            h.update(np.ascontiguousarray(valor).tobytes())
+        else:
+            h.update(repr(valor).encode())
+    return h.hexdigest()
+
+#%%
+"""
+Função principal: devolve o resultado do cache se ele existir, senão executa a busca,
+grava o resultado e aplica o limite de tamanho. O retorno é a mesma tupla das funções
+de motor_periodo.py.
+"""
+def periodograma_em_cache(metodo, tempo, fluxo, periodo_min, periodo_max, dp, diretorio=DIRETORIO_CACHE,
+                          limite=LIMITE_CACHE, **parametros):
+    funcao, melhor = METODOS[metodo]
+    # workers não altera o resultado, então não entra na chave
+    parametros_chave = {chave: valor for chave, valor in parametros.items() if chave != 'workers'}
+    chave = chave_cache(metodo, tempo, fluxo, periodo_min=periodo_min, periodo_max=periodo_max, dp=dp,
+                        **parametros_chave)
+    caminho = os.path.join(diretorio, chave + '.npz')
+    if os.path.exists(caminho):
+        with np.load(caminho) as dados:
+            periodos, comprimentos = dados['periodos'], dados['comprimentos']
+        os.utime(caminho) # Marca como usado recentemente
+    else:
+        _, periodos, _, comprimentos = funcao(tempo, fluxo, periodo_min, periodo_max, dp, **parametros)
+        os.makedirs(diretorio, exist_ok=True)
+        gravar_atomico(caminho, lambda temporario: np.savez_compressed(temporario, periodos=periodos,
+                                                                        comprimentos=comprimentos))
+        limitar_cache(diretorio, limite)
+    if np.all(np.isnan(comprimentos)):
+        return np.nan, periodos, np.nan, comprimentos # Nenhum período alcançou cobertura_min
+    indice = melhor(comprimentos)
+    return periodos[indice], periodos, comprimentos[indice], comprimentos
+
+#%%
+"""
+Funções para inspecionar, limitar e limpar o cache.
+"""
+def arquivos_cache(diretorio=DIRETORIO_CACHE):
+    arquivos = glob.glob(os.path.join(diretorio, '*.npz'))
+    arquivos = [a for a in arquivos if not a.endswith('.tmp.npz')]
+    return sorted(arquivos, key=os.path.getmtime) # Do menos para o mais recente
+
+def info_cache(diretorio=DIRETORIO_CACHE):
+    arquivos = arquivos_cache(diretorio)
+    return {
+        'diretorio': diretorio,
+        'num_arquivos': len(arquivos),
+        'tamanho_bytes': sum(os.path.getsize(a) for a in arquivos),
+        'arquivos': [os.path.basename(a) for a in arquivos],
+        }
+
+def limitar_cache(diretorio=DIRETORIO_CACHE, limite=LIMITE_CACHE):
+    arquivos = arquivos_cache(diretorio)
+    tamanho = sum(os.path.getsize(a) for a in arquivos)
+    for arquivo in arquivos:
+        if tamanho <= limite:
+            break
+        tamanho -= os.path.getsize(arquivo)
+        os.remove(arquivo)
+
+def limpar_cache(diretorio=DIRETORIO_CACHE):
+    for arquivo in arquivos_cache(diretorio):
+        os.remove(arquivo)
@@ -7,16 +7,8 @@ a biblioteca PyAstronomy
 import numpy as np
 import matplotlib.pylab as plt
 from PyAstronomy import pyTiming as pyt
-#%%
-def fluxo_ruidoso(tempo, profundidade, duracao, periodo, sigma):
-    fluxo = np.ones_like(tempo) # Fluxo base normalizado (=1)
-    for i in range(len(tempo)):
-        fase = (tempo[i] % periodo)
-        if fase < duracao:
-            fluxo[i] -= profundidade # Trânsito planetário
-    ruido = np.random.normal(0, sigma, len(fluxo))
-    return fluxo + ruido
-
+from grade_periodos import grade_periodos
+from simulacao import fluxo_ruidoso
 #%%
 dt = 0.00035
 tempo_max = 5.0
@@ -27,9 +19,13 @@ duracao = 0.1
 sigma = 0.001
 fluxo = fluxo_ruidoso(tempo, profundidade, duracao, periodo, sigma)
 
+GRADE_FISICA = False # Grade geométrica a partir do tempo total e da duração do trânsito
 dp = 0.001
 N_p = int(tempo_max/dp)
-tps = (0.5, tempo_max, N_p) # Intervalo de Periodos Teste
+if GRADE_FISICA:
+    tps = grade_periodos(tempo, 0.5, tempo_max, duracao) # Vetor de Periodos Teste
+else:
+    tps = (0.5, tempo_max, N_p) # Intervalo de Periodos Teste
 
 #%%
 p, sl = pyt.stringlength_dat(tempo, fluxo, tps)
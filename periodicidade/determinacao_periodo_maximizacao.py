@@ -7,6 +7,11 @@ de maximização do comprimento da corda formado por pontos representativos.
 #%%
 import numpy as np
 import matplotlib.pyplot as plt
+from cache_periodograma import periodograma_em_cache
+from grade_periodos import grade_periodos
+from simulacao import fluxo_ruidoso
+# Funções de dobragem e comprimento compartilhadas com os demais métodos
+from motor_periodo import busca_adaptativa_CL, dobrar_CL, maximizar_comprimento_CL
 
 #%%
 SINAL_UNICO = True
@@ -18,105 +23,6 @@ if SINAL_UNICO :
 else:
     TODOS_SINAIS = True
 
-#%%
-"""
-Função responsável por simular o fluxo de uma curva de luz com ruído gaussiano. 
-Fazemos isso utilizando o tempo de duração e o período dos trânsitos, assim 
-calculamos a sua localização temporal (fase) e caso esteja ocorrendo um trânsito
-descontamos um δf (profundidade) do fluxo médio, que está normalizado (=1). Ao
-final adicionamos um vetor de ruídos gaussianos ao vetor de fluxos. A função 
-permite 3 tipos de trânsitos (profundidades):
-    (i) Trânsito por uma função degrau;
-    (ii) Trânsito por uma função parabólica;
-    (iii) Ausência de trânsito.
-"""
-def fluxo_ruidoso(tempo, profundidade, duracao, periodo, sigma, transito):
-    fluxo = np.ones_like(tempo) # Fluxo base normalizado (=1)
-    A = np.array([[1,0,0],[1, duracao/2, (duracao/2)**2], [1, duracao, duracao**2]])
-    b = np.array([0, profundidade, 0])
-    coeficientes = np.linalg.solve(A, b)
-    for i in range(len(tempo)):
-        fase = (tempo[i] % periodo)
-        if fase < duracao:
-            if transito == 'degrau': 
-                fluxo[i] -= profundidade # Trânsito planetário
-            elif transito == 'parabola':
-                fluxo[i] -= coeficientes[0] + coeficientes[1]*fase + coeficientes[2]*fase**2
-            elif transito == 'vazio':
-                fluxo[i] = fluxo[i]
-    ruido = np.random.normal(0, sigma, len(fluxo))
-    return fluxo + ruido
-
-#%%
-"""
-Função responsável por realizar a superposição dos pontos da curva de luz (CL) em uma
-única curva no intervalo [0, periodo].
-"""
-def dobrar_CL(tempo, fluxo, periodo): 
-    fase = (tempo % periodo)  # Calcula a fase de cada ponto
-    fase_ordem = np.argsort(fase)  # Ordena as fases em ordem crescente
-    return fase[fase_ordem], fluxo[fase_ordem]
-
-#%%
-"""
-Função para calcular o comprimento de uma curva de luz (CL). Fazemos isso calculando
-a distancia (euclidiana em um espaço bidimensional) entre dois pontos consecutivos
-varrendo sobre todos os pontos da CL. Ao final somamos todos os comprimentos para 
-obter o comprimento total da CL. 
-"""
-def comprimento_CL(tempo, fluxo):
-    curva = np.column_stack((tempo, fluxo)) # Malha bidimensional da CL
-    variacao = np.diff(curva, axis=0) # Diferença entre componentes dos pontos consecutivos
-    distancias = np.linalg.norm(variacao, axis=1) # Norma entre pontos consecutivos
-    return np.sum(distancias)
-
-#%%
-"""
-Função para cálcular os pontos representativos de uma curva de luz (CL) dentro 
-de uma determinada partição temporal. Realizamos o particionamento do eixo temporal
-em M partições, após isso realizamos a média de todos os pontos dentro de uma 
-partição fazendo isso para todas as partições, assim trocamos N pontos da CL por
-M<<N pontos representativos da CL por partição temporal.
-"""
-def CL_representativa(tempo, fluxo):
-    num_pontos = len(tempo)
-    num_particoes = int(np.trunc(np.sqrt(num_pontos)))
-    particoes = np.linspace(np.min(tempo), np.max(tempo), num_particoes + 1)
-    # Retorna, para cada ponto de tempo, o índice da partição à qual ele pertence
-    indices_particoes = np.digitize(tempo, particoes) 
-    tempo_media = []
-    fluxo_media = []
-    for i in range(1, len(particoes)):
-        # Seleciona os valores de tempo e fluxo que pertencem à partição atual
-        tempo_particao = tempo[indices_particoes == i]
-        fluxo_particao = fluxo[indices_particoes == i] 
-        tempo_media_particao = np.mean(tempo_particao)
-        fluxo_media_particao = np.mean(fluxo_particao)
-        tempo_media.append(tempo_media_particao)
-        fluxo_media.append(fluxo_media_particao)
-    return np.array(tempo_media), np.array(fluxo_media)
-
-#%%
-"""
-Função responsável por encotrar o período, se ele existir, de uma curva de luz (CL).
-Fazemos isso realizando a dobragem da CL por um período teste, fazemos esse período
-variar de um período minímo até um tempo total da CL, após isso realizamos a 
-substituição da CL por seus pontos representativos por partição temporal. O período
-responsável por maximizar o comprimento da CL será o período real.
-"""
-def maximizar_comprimento_CL(tempo, fluxo, periodo_min, periodo_max, dp):
-    periodos = np.arange(periodo_min, periodo_max, dp)
-    comprimentos = []
-
-    for periodo in periodos:
-        fase, fluxo_dobrado = dobrar_CL(tempo, fluxo, periodo)
-        fase_representativa, fluxo_representativo = CL_representativa(fase, fluxo_dobrado)
-        # Normalizamos os comprimento da CL para observar os detalhes
-        comprimentos.append(comprimento_CL(fase_representativa, fluxo_representativo) / periodo)
-        
-    indice_maior = np.argmax(comprimentos) # Indíce associado ao maior comprimento
-    return periodos[indice_maior], periodos, comprimentos[indice_maior], comprimentos
-
 #%%
 """
 Parâmetos do trânsito planetário.
@@ -136,6 +42,16 @@ Parâmetros da simulação.
 periodo_min = 0.5 # Período mínimo utilizado nos testes
 periodo_max = tempo_max # Período maxímo utilizado nos testes
 dp = 0.001 # Sempre ≤ que a cadência
+workers = None # Número de processos da varredura (None = um único núcleo)
+BUSCA_ADAPTATIVA = False # Busca do grosso para o fino (somente para SINAL_UNICO)
+dp_grosso = 0.01 # Passo da primeira varredura, deve resolver a largura do vale (≈ duracao*periodo/tempo_max)
+GRADE_FISICA = False # Grade geométrica a partir do tempo total e da duração, no lugar de dp
+periodos_teste = grade_periodos(tempo, periodo_min, periodo_max, duracao) if GRADE_FISICA else None
+USAR_CACHE = False # Reaproveita resultados salvos em disco (o ruído usa a semente abaixo para repetir)
+semente = 0 if USAR_CACHE else None # Semente do ruído (np.random.seed); None = ruído diferente a cada execução
+if semente is not None:
+    np.random.seed(semente)
+busca_periodo = (lambda *args, **kwargs: periodograma_em_cache('max', *args, **kwargs)) if USAR_CACHE else maximizar_comprimento_CL
 #%%
 """
 Integração do algoritmo.
@@ -143,7 +59,11 @@ Integração do algoritmo.
 if SINAL_UNICO:
     fluxo = fluxo_ruidoso(tempo, profundidade, duracao, periodo, sigma, transito[SINAL]) 
     fase, fluxo_dobrado = dobrar_CL(tempo, fluxo, periodo)
-    periodo_real_Mx, periodos_Mx, menor_comprimento_Mx, comprimentos_Mx = maximizar_comprimento_CL(tempo, fluxo, periodo_min, periodo_max, dp)
+    if BUSCA_ADAPTATIVA:
+        periodo_real_Mx, periodos_Mx, menor_comprimento_Mx, comprimentos_Mx, precisao_Mx, avaliacoes_Mx = busca_adaptativa_CL(tempo, fluxo, periodo_min, periodo_max, dp_grosso, dp, 'max')
+        print(f'Precisão final = {precisao_Mx} | Períodos avaliados = {avaliacoes_Mx}')
+    else:
+        periodo_real_Mx, periodos_Mx, menor_comprimento_Mx, comprimentos_Mx = busca_periodo(tempo, fluxo, periodo_min, periodo_max, dp, workers=workers, periodos=periodos_teste)
 
 else:
     eixo_periodos = []
@@ -153,7 +73,7 @@ else:
     for sinal in transito:
         fluxo = fluxo_ruidoso(tempo, profundidade, duracao, periodo, sigma, sinal) 
         fase, fluxo_dobrado = dobrar_CL(tempo, fluxo, periodo)
-        periodo_real_Mx, periodos_Mx, menor_comprimento_Mx, comprimentos_Mx = maximizar_comprimento_CL(tempo, fluxo, periodo_min, periodo_max, dp)
+        periodo_real_Mx, periodos_Mx, menor_comprimento_Mx, comprimentos_Mx = busca_periodo(tempo, fluxo, periodo_min, periodo_max, dp, workers=workers, periodos=periodos_teste)
         eixo_periodos.append(periodos_Mx)
         eixo_comprimentos.append(comprimentos_Mx)
         periodos_determinados.append(periodo_real_Mx)
@@ -17,76 +17,12 @@ else:
 #%%
 import numpy as np
 import matplotlib.pyplot as plt
-
-#%%
-"""
-Função responsável por simular o fluxo de uma curva de luz com ruído gaussiano. 
-Fazemos isso utilizando o tempo de duração e o período dos trânsitos, assim 
-calculamos a sua localização temporal (fase) e caso esteja ocorrendo um trânsito
-descontamos um δf (profundidade) do fluxo médio, que está normalizado (=1). Ao
-final adicionamos um vetor de ruídos gaussianos ao vetor de fluxos. A função 
-permite 3 tipos de trânsitos (profundidades):
-    (i) Trânsito por uma função degrau;
-    (ii) Trânsito por uma função parabólica;
-    (iii) Ausência de trânsito.
-"""
-def fluxo_ruidoso(tempo, profundidade, duracao, periodo, sigma, transito):
-    fluxo = np.ones_like(tempo) # Fluxo base normalizado (=1)
-    A = np.array([[1,0,0],[1, duracao/2, (duracao/2)**2], [1, duracao, duracao**2]])
-    b = np.array([0, profundidade, 0])
-    coeficientes = np.linalg.solve(A, b)
-    for i in range(len(tempo)):
-        fase = (tempo[i] % periodo)
-        if fase < duracao:
-            if transito == 'degrau': 
-                fluxo[i] -= profundidade # Trânsito planetário
-            elif transito == 'parabola':
-                fluxo[i] -= coeficientes[0] + coeficientes[1]*fase + coeficientes[2]*fase**2
-            elif transito == 'vazio':
-                fluxo[i] = fluxo[i]
-    ruido = np.random.normal(0, sigma, len(fluxo))
-    return fluxo + ruido
-
-#%%
-"""
-Função responsável por realizar a superposição dos pontos da curva de luz (CL) em uma
-única curva no intervalo [0, periodo].
-"""
-def dobrar_CL(tempo, fluxo, periodo): 
-    fase = (tempo % periodo)  # Calcula a fase de cada ponto
-    fase_ordem = np.argsort(fase)  # Ordena as fases em ordem crescente
-    return fase[fase_ordem], fluxo[fase_ordem]
-
-#%%
-"""
-Função para calcular o comprimento de uma curva de luz (CL). Fazemos isso calculando
-a distancia (euclidiana em um espaço bidimensional) entre dois pontos consecutivos
-varrendo sobre todos os pontos da CL. Ao final somamos todos os comprimentos para 
-obter o comprimento total da CL. 
-"""
-def comprimento_CL(tempo, fluxo):
-    curva = np.column_stack((tempo, fluxo)) # Malha bidimensional da CL
-    variacao = np.diff(curva, axis=0) # Diferença entre componentes dos pontos consecutivos
-    distancias = np.linalg.norm(variacao, axis=1) # Norma entre pontos consecutivos
-    return np.sum(distancias)
-
-#%%
-"""
-Função responsável por encontrar o período, se ele existe, de uma curva de luz (CL).
-Fazemos isso realizando a superposição da CL por um período teste, fazemos esse
-período teste variar de um limite minímo até o tempo total da CL. O período 
-responsável por minimizar o comprimento da CL será o período real.
-"""
-def minimizar_comprimento_CL(tempo, fluxo, periodo_min, periodo_max, dp):
-    periodos = np.arange(periodo_min, periodo_max, dp)
-    comprimentos = []
-
-    for periodo in periodos:
-        fase, fluxo_dobrado = dobrar_CL(tempo, fluxo, periodo)
-        comprimentos.append(comprimento_CL(fase, fluxo_dobrado))
-    
-    indice_menor = np.argmin(comprimentos) # Indíce associado ao menor comprimento
-    return periodos[indice_menor], periodos, comprimentos[indice_menor], comprimentos
+from cache_periodograma import periodograma_em_cache
+from falso_alarme import probabilidade_falso_alarme
+from grade_periodos import grade_periodos
+from simulacao import fluxo_ruidoso
+# Funções de dobragem e comprimento compartilhadas com os demais métodos
+from motor_periodo import busca_adaptativa_CL, dobrar_CL, comprimento_CL, minimizar_comprimento_CL
 
 #%%
 """
@@ -108,6 +44,19 @@ Parâmetros da simulação.
 periodo_min = 0.5 # Período mínimo utilizado nos testes
 periodo_max = tempo_max # Período maxímo utilizado nos testes
 dp = 0.001 # Sempre ≤ que a cadência
+workers = None # Número de processos da varredura (None = um único núcleo)
+precisao = 'float64' # 'float32' usa tempo re-referenciado e volta ao float64 se a validação falhar
+BUSCA_ADAPTATIVA = False # Busca do grosso para o fino (somente para SINAL_UNICO)
+dp_grosso = 0.01 # Passo da primeira varredura, deve resolver a largura do vale (≈ duracao*periodo/tempo_max)
+GRADE_FISICA = False # Grade geométrica a partir do tempo total e da duração, no lugar de dp
+periodos_teste = grade_periodos(tempo, periodo_min, periodo_max, duracao) if GRADE_FISICA else None
+CALCULAR_FAP = False # Probabilidade de falso alarme por permutação do fluxo (somente para SINAL_UNICO)
+dp_fap = 0.01 # Passo da grade das permutações (mais grosso que dp para a FAP levar segundos)
+USAR_CACHE = False # Reaproveita resultados salvos em disco (o ruído usa a semente abaixo para repetir)
+semente = 0 if USAR_CACHE else None # Semente do ruído (np.random.seed); None = ruído diferente a cada execução
+if semente is not None:
+    np.random.seed(semente)
+busca_periodo = (lambda *args, **kwargs: periodograma_em_cache('min', *args, **kwargs)) if USAR_CACHE else minimizar_comprimento_CL
 
 #%%
 """
@@ -116,7 +65,14 @@ Integração do algoritmo.
 if SINAL_UNICO:
     fluxo = fluxo_ruidoso(tempo, profundidade, duracao, periodo, sigma, transito[SINAL]) 
     fase, fluxo_dobrado = dobrar_CL(tempo, fluxo, periodo)
-    periodo_real_Mn, periodos_Mn, menor_comprimento_Mn, comprimentos_Mn = minimizar_comprimento_CL(tempo, fluxo, periodo_min, periodo_max, dp)
+    if BUSCA_ADAPTATIVA:
+        periodo_real_Mn, periodos_Mn, menor_comprimento_Mn, comprimentos_Mn, precisao_Mn, avaliacoes_Mn = busca_adaptativa_CL(tempo, fluxo, periodo_min, periodo_max, dp_grosso, dp, 'min')
+        print(f'Precisão final = {precisao_Mn} | Períodos avaliados = {avaliacoes_Mn}')
+    else:
+        periodo_real_Mn, periodos_Mn, menor_comprimento_Mn, comprimentos_Mn = busca_periodo(tempo, fluxo, periodo_min, periodo_max, dp, workers=workers, periodos=periodos_teste, precisao=precisao)
+    if CALCULAR_FAP:
+        fap_Mn, intervalo_fap_Mn, tentativas_Mn, _ = probabilidade_falso_alarme(tempo, fluxo, np.arange(periodo_min, periodo_max, dp_fap), limiar=0.01, workers=workers)
+        print(f'FAP = {fap_Mn:.4f} | Intervalo de 95% = [{intervalo_fap_Mn[0]:.4f}, {intervalo_fap_Mn[1]:.4f}] | Permutações = {tentativas_Mn}')
 
 else:
     eixo_periodos = []
@@ -126,7 +82,7 @@ else:
     for sinal in transito:
         fluxo = fluxo_ruidoso(tempo, profundidade, duracao, periodo, sigma, sinal) 
         fase, fluxo_dobrado = dobrar_CL(tempo, fluxo, periodo)
-        periodo_real_Mn, periodos_Mn, menor_comprimento_Mn, comprimentos_Mn = minimizar_comprimento_CL(tempo, fluxo, periodo_min, periodo_max, dp)
+        periodo_real_Mn, periodos_Mn, menor_comprimento_Mn, comprimentos_Mn = busca_periodo(tempo, fluxo, periodo_min, periodo_max, dp, workers=workers, periodos=periodos_teste, precisao=precisao)
         eixo_periodos.append(periodos_Mn)
         eixo_comprimentos.append(comprimentos_Mn)
         periodos_determinados.append(periodo_real_Mn)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Código para determinar o período de uma curva de luz utilizando o método de
+minimização da dispersão de fase (PDM), com a mesma grade de períodos e dobragem
+dos métodos de comprimento de corda.
+"""
+#%%
+SINAL_UNICO = True
+if SINAL_UNICO :
+    SINAL = 0 # Degrau = 0 | Parábolico = 1 | Vazio = 2
+    PLOT_TRIPLO_MINIMO = True
+    PLOT_MINIMO = True
+    TODOS_SINAIS = False
+else:
+    TODOS_SINAIS = True
+
+#%%
+import numpy as np
+import matplotlib.pyplot as plt
+from cache_periodograma import periodograma_em_cache
+from grade_periodos import grade_periodos
+from simulacao import fluxo_ruidoso
+# Funções de dobragem e da estatística PDM compartilhadas com os demais métodos
+from motor_periodo import dobrar_CL, minimizar_pdm
+
+#%%
+"""
+Parâmetos do trânsito planetário.
+"""
+dt = 0.00035 # Cadência em dias (≈ 30 segundos)
+tempo_max = 5.0 # Tempo de exposição da curva de luz
+tempo = np.arange(0, tempo_max, dt)  # Tempo de observação da curva de luz 
+profundidade = 0.01 # Profundidade do trânsito 
+periodo = 1.0 # Em dias
+duracao = 0.1 # Duração do trânsito em dias (= 2 horas 24 minutos)
+sigma = 0.001 # Nível de ruído no fluxo
+transito = ['degrau', 'parabola', 'vazio']
+
+#%%
+"""
+Parâmetros da simulação.
+"""
+periodo_min = 0.5 # Período mínimo utilizado nos testes
+periodo_max = tempo_max # Período maxímo utilizado nos testes
+dp = 0.001 # Sempre ≤ que a cadência
+num_particoes = None # Partições de fase (None = √N); cada partição deve ser menor que o trânsito
+workers = None # Número de processos da varredura (None = um único núcleo)
+GRADE_FISICA = False # Grade geométrica a partir do tempo total e da duração, no lugar de dp
+periodos_teste = grade_periodos(tempo, periodo_min, periodo_max, duracao) if GRADE_FISICA else None
+USAR_CACHE = False # Reaproveita resultados salvos em disco (o ruído usa a semente abaixo para repetir)
+semente = 0 if USAR_CACHE else None # Semente do ruído (np.random.seed); None = ruído diferente a cada execução
+if semente is not None:
+    np.random.seed(semente)
+busca_periodo = (lambda *args, **kwargs: periodograma_em_cache('pdm', *args, **kwargs)) if USAR_CACHE else minimizar_pdm
+
+#%%
+"""
+Integração do algoritmo.
+"""
+if SINAL_UNICO:
+    fluxo = fluxo_ruidoso(tempo, profundidade, duracao, periodo, sigma, transito[SINAL])
+    periodo_real_PDM, periodos_PDM, menor_theta_PDM, thetas_PDM = busca_periodo(tempo, fluxo, periodo_min, periodo_max, dp, num_particoes=num_particoes, workers=workers, periodos=periodos_teste)
+    fase, fluxo_dobrado = dobrar_CL(tempo, fluxo, periodo_real_PDM)
+
+else:
+    eixo_periodos = []
+    periodos_determinados = []
+    eixo_thetas = []
+    for sinal in transito:
+        fluxo = fluxo_ruidoso(tempo, profundidade, duracao, periodo, sigma, sinal)
+        periodo_real_PDM, periodos_PDM, menor_theta_PDM, thetas_PDM = busca_periodo(tempo, fluxo, periodo_min, periodo_max, dp, num_particoes=num_particoes, workers=workers, periodos=periodos_teste)
+        eixo_periodos.append(periodos_PDM)
+        eixo_thetas.append(thetas_PDM)
+        periodos_determinados.append(periodo_real_PDM)
+
+#%%
+"""
+Plota θ em função do período.
+"""
+def plot_theta_periodo(periodos, thetas, periodo_real):
+    plt.plot(periodos, thetas, label='θ (PDM)', color='blueviolet')
+    plt.axvline(x=periodo_real, color='r', alpha = 0.5, linestyle='--', label=f'Período Estimado = {periodo_real:.4f}')
+    plt.xlabel('Período')
+    plt.ylabel('θ')
+    plt.legend()
+
+#%%
+if SINAL_UNICO:
+    if PLOT_TRIPLO_MINIMO:
+        plt.figure(figsize=(12, 12), dpi=200)
+        plt.subplot(3, 1, 1)
+        plt.plot(tempo, fluxo, label='Curva de Luz', color='lightsteelblue')
+        plt.xlabel('Tempo')
+        plt.ylabel('Fluxo')
+        plt.legend()
+
+        plt.subplot(3, 1, 2)
+        plt.scatter(fase, fluxo_dobrado, s=5.0, label=f'Curva de Luz Dobrada (Período estimado = {periodo_real_PDM:.4f})', color='royalblue')
+        plt.xlabel('Fase')
+        plt.ylabel('Fluxo')
+        plt.legend()
+
+        plt.subplot(3, 1, 3)
+        plot_theta_periodo(periodos_PDM, thetas_PDM, periodo_real_PDM)
+        plt.suptitle('Método de Minimização da Dispersão de Fase')
+        plt.tight_layout()
+        plt.show()
+
+    if PLOT_MINIMO:
+        plt.figure(figsize=(12, 6), dpi=200)
+        plot_theta_periodo(periodos_PDM, thetas_PDM, periodo_real_PDM)
+        plt.show()
+
+if TODOS_SINAIS:
+    plt.figure(figsize=(12, 6), dpi=200)
+    plt.plot(eixo_periodos[0], eixo_thetas[0], label=f'Degrau | Periodo = {periodos_determinados[0]:.2f} dias', color='indigo', linewidth=2, alpha=0.8)
+    plt.plot(eixo_periodos[1], eixo_thetas[1], label=f'Parábola | Periodo = {periodos_determinados[1]:.2f} dias', color='orangered', linewidth=2, alpha=0.5)
+    plt.plot(eixo_periodos[2], eixo_thetas[2], label='Vazio', color='green', linewidth=2, alpha=0.9)
+    plt.legend(title="Tipos de sinais", fontsize=12, title_fontsize=14, loc='upper right', frameon=True)
+    plt.title('Diferentes Tipos de Sinais no Método PDM', fontsize=14, fontweight='bold')
+    plt.xlabel('Período', fontsize=12)
+    plt.ylabel('θ', fontsize=12)
+    plt.grid(alpha=0.3, linestyle='--')
+    plt.tight_layout()
+    plt.show()
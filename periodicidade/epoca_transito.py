@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Estimativa da época do trânsito (o tempo do centro de um trânsito) quando o período já
+é conhecido, por exemplo pelo catálogo. A curva dobrada é dividida em partições de
+largura duracao/particoes_por_duracao e, com um único np.bincount, obtemos a
+quantidade de pontos e a soma do fluxo de cada partição. O fluxo médio em uma janela
+da largura do trânsito (o filtro casado com um trânsito em caixa) é mínimo quando a
+janela coincide com o trânsito, e uma parábola pelos três valores em torno do mínimo
+dá a posição com precisão menor que uma partição. Todo o cálculo é O(N) e vale para
+vários alvos de uma vez, com as curvas concatenadas por concatenar_curvas. Uso:
+    from epoca_transito import epoca_transito, epocas_transito
+    epoca = epoca_transito(tempo, fluxo, periodo, duracao_catalogo(tic_id))
+    epocas, profundidades = epocas_transito(tempo, fluxo, offsets, periodos, duracoes)
+"""
+#%%
+import numpy as np
+
+#%%
+"""
+Função principal. periodos e duracoes (em dias) têm um valor por alvo; o alvo k ocupa
+o trecho offsets[k]:offsets[k+1] de tempo e fluxo. Como a largura das partições é
+proporcional à duração, a janela tem sempre particoes_por_duracao partições, mas o
+número de partições, ceil(periodo/largura), varia por alvo. As partições de todos os
+alvos ficam em um único vetor e as somas na janela saem das somas acumuladas; a
+janela que passa do fim da fase continua no começo da fase do mesmo alvo. Retorna,
+para cada alvo, a época do primeiro trânsito a partir do início da curva e a
+profundidade (fluxo médio menos o fluxo médio no trânsito).
+"""
+def epocas_transito(tempo, fluxo, offsets, periodos, duracoes, particoes_por_duracao=8):
+    tempo = np.asarray(tempo, dtype=float)
+    fluxo = np.asarray(fluxo, dtype=float)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    periodos = np.asarray(periodos, dtype=float)
+    duracoes = np.asarray(duracoes, dtype=float)
+    num_alvos = len(offsets) - 1
+    alvo = np.repeat(np.arange(num_alvos), np.diff(offsets))
+    inicio = np.minimum.reduceat(tempo, offsets[:-1])
+
+    # Partições de cada alvo e a posição do primeiro índice de cada alvo no vetor único
+    num_particoes = np.maximum(np.ceil(particoes_por_duracao * periodos / duracoes).astype(np.int64), 2)
+    janela = np.minimum(particoes_por_duracao, num_particoes - 1)
+    primeira = np.concatenate(([0], np.cumsum(num_particoes)))
+    fase = ((tempo - inicio[alvo]) / periodos[alvo]) % 1.0
+    particao = np.minimum((fase * num_particoes[alvo]).astype(np.int64), num_particoes[alvo] - 1)
+    indices = primeira[alvo] + particao
+    contagens = np.bincount(indices, minlength=primeira[-1]).astype(float)
+    somas = np.bincount(indices, fluxo, primeira[-1])
+
+    # Somas na janela [j, j + janela) de cada partição j, dando a volta na fase
+    alvo_particao = np.repeat(np.arange(num_alvos), num_particoes)
+    j = np.arange(primeira[-1]) - primeira[alvo_particao]
+    fim = j + janela[alvo_particao]
+    volta = fim > num_particoes[alvo_particao]
+    def soma_janela(valores):
+        C = np.concatenate(([0.0], np.cumsum(valores)))
+        base = primeira[alvo_particao]
+        direta = C[base + np.minimum(fim, num_particoes[alvo_particao])] - C[base + j]
+        resto = C[base + np.where(volta, fim - num_particoes[alvo_particao], 0)] - C[base]
+        return direta + resto
+    with np.errstate(invalid='ignore', divide='ignore'):
+        media_janela = soma_janela(somas) / soma_janela(contagens)
+    media_janela[~np.isfinite(media_janela)] = np.inf
+
+    # Partição de menor média em cada alvo (a primeira em caso de empate)
+    ordem = np.lexsort((media_janela, alvo_particao))
+    menor = ordem[primeira[:-1]] - primeira[:-1]
+
+    # Parábola pelos vizinhos (circulares) da partição mínima
+    anterior = media_janela[primeira[:-1] + (menor - 1) % num_particoes]
+    centro = media_janela[primeira[:-1] + menor]
+    seguinte = media_janela[primeira[:-1] + (menor + 1) % num_particoes]
+    curvatura = anterior - 2*centro + seguinte
+    with np.errstate(invalid='ignore', divide='ignore'):
+        deslocamento = np.where(curvatura > 0, 0.5 * (anterior - seguinte) / curvatura, 0.0)
+    deslocamento = np.clip(np.nan_to_num(deslocamento), -0.5, 0.5)
+
+    fase_centro = (menor + deslocamento + janela / 2) / num_particoes
+    epocas = inicio + fase_centro * periodos
+    epocas -= periodos * np.floor((epocas - inicio) / periodos) # Primeiro trânsito depois do início
+    media = np.bincount(alvo, fluxo, num_alvos) / np.diff(offsets)
+    return epocas, media - centro
+
+#%%
+"""
+Versão para um único alvo.
+"""
+def epoca_transito(tempo, fluxo, periodo, duracao, particoes_por_duracao=8):
+    offsets = np.array([0, len(tempo)])
+    epocas, _ = epocas_transito(tempo, fluxo, offsets, [periodo], [duracao], particoes_por_duracao)
+    return epocas[0]
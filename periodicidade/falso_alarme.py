@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Probabilidade de falso alarme (FAP) do menor comprimento de corda, por permutação.
+Embaralhar o fluxo destrói qualquer periodicidade mas mantém a distribuição dos
+valores (profundidade, ruído, outliers), então o menor comprimento da CL embaralhada
+sobre a mesma grade de períodos é uma amostra da hipótese nula. A FAP é a fração das
+tentativas cujo menor comprimento é menor ou igual ao observado. Uso:
+    from falso_alarme import probabilidade_falso_alarme
+    fap, (inferior, superior), tentativas, minimos = probabilidade_falso_alarme(tempo, fluxo, periodos)
+"""
+#%%
+import numpy as np
+from contextlib import nullcontext
+from statistics import NormalDist
+
+from motor_periodo import MEMORIA_MAX, comprimentos_lote, processos_compartilhados, tamanho_bloco, vetores_compartilhados
+
+#%%
+"""
+Intervalo de confiança de Wilson para a proporção de k sucessos em n tentativas.
+Diferente da aproximação normal, ele não colapsa para largura zero quando k = 0.
+"""
+def intervalo_wilson(k, n, nivel_confianca=0.95):
+    z = NormalDist().inv_cdf(0.5 + nivel_confianca / 2)
+    p = k / n
+    centro = (p + z**2 / (2*n)) / (1 + z**2 / n)
+    margem = z * np.sqrt(p*(1 - p)/n + z**2 / (4*n**2)) / (1 + z**2 / n)
+    return max(centro - margem, 0.0), min(centro + margem, 1.0)
+
+#%%
+"""
+Função que executa um conjunto de tentativas. Cada tentativa recebe a sua própria
+SeedSequence, derivada da semente principal, então o resultado de cada tentativa é o
+mesmo qualquer que seja o número de processos ou a ordem de execução.
+Embaralhar o fluxo não muda a ordem das fases, então para cada bloco de períodos a
+ordenação (a parte mais cara da dobragem) é feita uma única vez e reaproveitada por
+todas as tentativas do conjunto; cada tentativa custa apenas a seleção dos fluxos
+nessa ordem e a soma das distâncias. As contas são as mesmas de comprimentos_bloco.
+"""
+def menores_comprimentos_nulos(tempo, fluxo, periodos, sementes, memoria_max=MEMORIA_MAX):
+    fluxos = np.stack([np.random.default_rng(semente).permutation(fluxo) for semente in sementes])
+    minimos = np.full(len(sementes), np.inf)
+    # Ordem e as distâncias em fase ficam guardadas durante o bloco: 2 vetores a mais por ponto
+    bloco = tamanho_bloco(len(tempo), max(memoria_max // 2, 1))
+    for inicio in range(0, len(periodos), bloco):
+        fases = tempo[np.newaxis, :] % periodos[inicio:inicio + bloco, np.newaxis]
+        ordem = np.argsort(fases, axis=-1, kind='stable')
+        dx = np.diff(np.take_along_axis(fases, ordem, axis=-1), axis=-1)
+        dx2 = dx*dx
+        del fases, dx
+        for i, fluxo_embaralhado in enumerate(fluxos):
+            dy = np.diff(fluxo_embaralhado[ordem], axis=-1)
+            comprimentos = np.sum(np.sqrt(dx2 + dy*dy), axis=-1, dtype=np.float64)
+            minimos[i] = min(minimos[i], np.min(comprimentos))
+    return minimos
+
+def _tentativas_fragmento(argumentos):
+    periodos, sementes, memoria_max = argumentos
+    tempo, fluxo = vetores_compartilhados()
+    return menores_comprimentos_nulos(tempo, fluxo, periodos, sementes, memoria_max)
+
+#%%
+"""
+Função principal. As tentativas são feitas em lotes de tamanho_lote tentativas
+(divididos em um fragmento por processo) e, após cada lote, calculamos o intervalo de
+confiança da FAP: a busca para quando a
+largura do intervalo fica abaixo de largura_max ou quando max_tentativas é atingido.
+Para triagem de muitos alvos basta saber se a FAP está abaixo de um limiar (por
+exemplo 0.01): com limiar definido a busca também para assim que o intervalo fica
+inteiro acima ou abaixo dele. O tamanho do lote não depende do número de processos,
+então a busca para sempre no mesmo ponto e o resultado é o mesmo com qualquer workers.
+O menor comprimento observado é calculado na mesma grade das tentativas, então a grade
+pode ser mais grossa que a da busca do período para a FAP levar segundos, desde que
+o passo ainda resolva o vale do comprimento (dp ≲ duracao * periodo_min / tempo total).
+A FAP retornada é (k + 1) / (n + 1), que nunca é zero com um número finito de
+tentativas, e o intervalo de Wilson é calculado para a mesma proporção (k + 1 em
+n + 1), então ele sempre contém a FAP retornada.
+"""
+def probabilidade_falso_alarme(tempo, fluxo, periodos, max_tentativas=1000, largura_max=0.02, limiar=None,
+                               nivel_confianca=0.95, semente=0, workers=None, tamanho_lote=32,
+                               memoria_max=MEMORIA_MAX):
+    if max_tentativas < 1 or tamanho_lote < 1:
+        raise ValueError("max_tentativas e tamanho_lote precisam ser pelo menos 1")
+    tempo = np.ascontiguousarray(tempo, dtype=np.float64)
+    fluxo = np.ascontiguousarray(fluxo, dtype=np.float64)
+    periodos = np.asarray(periodos, dtype=float)
+    comprimento_observado = np.min(comprimentos_lote(tempo, fluxo, periodos, memoria_max))
+    sementes = np.random.SeedSequence(semente).spawn(max_tentativas)
+    workers = 1 if workers is None else workers
+
+    minimos = []
+    with processos_compartilhados(tempo, fluxo, workers) if workers > 1 else nullcontext() as executor:
+        for inicio in range(0, max_tentativas, tamanho_lote):
+            lote = sementes[inicio:inicio + tamanho_lote]
+            if executor is None:
+                minimos.append(menores_comprimentos_nulos(tempo, fluxo, periodos, lote, memoria_max))
+            else:
+                cortes = np.linspace(0, len(lote), workers + 1).astype(int)
+                fragmentos = [lote[i:j] for i, j in zip(cortes[:-1], cortes[1:]) if j > i]
+                tarefas = [(periodos, fragmento, max(memoria_max // workers, 1)) for fragmento in fragmentos]
+                minimos.extend(executor.map(_tentativas_fragmento, tarefas))
+            num_tentativas = sum(len(m) for m in minimos)
+            excedentes = sum(int(np.sum(m <= comprimento_observado)) for m in minimos)
+            fap = (excedentes + 1) / (num_tentativas + 1)
+            inferior, superior = intervalo_wilson(excedentes + 1, num_tentativas + 1, nivel_confianca)
+            if superior - inferior <= largura_max:
+                break
+            if limiar is not None and (superior < limiar or inferior > limiar):
+                break
+
+    return fap, (inferior, superior), num_tentativas, np.concatenate(minimos)
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Funções para gerar a grade de períodos teste a partir de grandezas físicas, em vez de
+um passo dp escolhido à mão. Ao errar o período por δP, um trânsito se desloca em fase
+de δP * (T / P) ao fim de uma curva de luz com duração total T. Para não perder o
+trânsito esse deslocamento deve ser menor que a sua duração, dividida por um fator de
+sobreamostragem:
+    δP = P * duracao / (sobreamostragem * T)
+Como δP é proporcional a P, a grade resultante é geométrica, mais fina nos períodos
+curtos e mais grossa nos longos. O comprimento de corda é sensível ao desalinhamento
+das bordas do trânsito, então usamos sobreamostragem = 10 por padrão (com 3 o mínimo
+em P = 1 dia da simulação já se perde). Uso:
+    from grade_periodos import grade_periodos
+    periodos = grade_periodos(tempo, periodo_min, periodo_max, duracao)
+As buscas de período (motor_periodo.py, busca_caixa.py) recebem essa grade pelo
+parâmetro periodos, que substitui o passo uniforme dp.
+"""
+#%%
+import os
+import numpy as np
+import pandas as pd # versão 2.2.1
+
+#%%
+"""
+Caminho padrão para o catálogo do ExoFOP salvo no repositório.
+"""
+CAMINHO_EXOFOP = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..',
+                              'dados_exoplanetas', 'dados_exofop.csv')
+
+#%%
+"""
+Função que calcula o passo máximo entre períodos teste consecutivos para que o
+trânsito não se desloque mais que duracao / sobreamostragem ao longo da curva.
+"""
+def passo_periodo(periodo, duracao, tempo_total, sobreamostragem=10):
+    return periodo * duracao / (sobreamostragem * tempo_total)
+
+#%%
+"""
+Função que gera a grade de períodos teste no intervalo [periodo_min, periodo_max).
+O tempo total da curva (baseline) é obtido do próprio vetor de tempo e a duração do
+trânsito deve estar em dias (a mesma unidade do tempo).
+"""
+def grade_periodos(tempo, periodo_min, periodo_max, duracao, sobreamostragem=10):
+    tempo_total = np.max(tempo) - np.min(tempo)
+    if tempo_total <= 0 or duracao <= 0:
+        raise ValueError("O tempo total da curva e a duração do trânsito devem ser positivos")
+    razao = np.log1p(passo_periodo(1.0, duracao, tempo_total, sobreamostragem))
+    num_periodos = int(np.ceil(np.log(periodo_max / periodo_min) / razao))
+    periodos = periodo_min * np.exp(razao * np.arange(num_periodos))
+    return periodos[periodos < periodo_max]
+
+#%%
+"""
+Função que lê a duração do trânsito (coluna 'Duration (hours)') de um alvo no
+catálogo do ExoFOP e a devolve em dias. Se o TIC possuir mais de um TOI, usamos a
+menor duração, que gera a grade mais fina.
+"""
+def duracao_catalogo(tic_id, caminho=CAMINHO_EXOFOP):
+    dados = pd.read_csv(caminho)
+    duracoes = dados.loc[dados['TIC ID'] == int(tic_id), 'Duration (hours)'].dropna()
+    if len(duracoes) == 0:
+        raise KeyError(f"TIC {tic_id} sem duração de trânsito em {caminho}")
+    return float(duracoes.min()) / 24
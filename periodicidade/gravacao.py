@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Gravação atômica de arquivos. O conteúdo é gravado em um arquivo temporário na mesma
+pasta, que depois substitui o destino com os.replace, então uma execução interrompida
+nunca deixa um arquivo pela metade e quem lê vê o arquivo antigo ou o novo. O nome do
+temporário leva o processo e a thread, para que gravações simultâneas do mesmo arquivo
+não se misturem, e termina com a extensão do destino (np.save e np.savez acrescentam
+.npy e .npz a nomes sem essa extensão). Uso:
+    from gravacao import gravar_atomico
+    gravar_atomico('alvo.npz', lambda temporario: np.savez(temporario, **dados))
+"""
+#%%
+import os
+import threading
+
+#%%
+def nome_temporario(caminho):
+    raiz, extensao = os.path.splitext(caminho)
+    return f'{raiz}.{os.getpid()}.{threading.get_ident()}.tmp{extensao}'
+
+def gravar_atomico(caminho, gravar):
+    temporario = nome_temporario(caminho)
+    try:
+        gravar(temporario)
+        os.replace(temporario, caminho)
+    except BaseException:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
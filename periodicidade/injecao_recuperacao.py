@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Teste de injeção e recuperação. Trânsitos simulados são injetados em uma grade de
+períodos, profundidades, durações e níveis de ruído, o método de determinação de
+período escolhido é aplicado a cada curva e guardamos o período recuperado. A fração
+de curvas recuperadas em cada célula da grade é o mapa de completude do método.
+As tentativas são divididas em lotes avaliados por um conjunto de processos, e o
+progresso é salvo periodicamente em disco: se a execução for interrompida, rodar o
+código de novo continua de onde parou.
+"""
+#%%
+import os
+import csv
+import time
+import numpy as np
+import matplotlib.pyplot as plt
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from busca_caixa import busca_caixa
+from gravacao import gravar_atomico
+from motor_periodo import comprimentos_lote, comprimentos_representativos, thetas_pdm, contexto_processos
+from simulacao import gerar_curvas
+
+#%%
+"""
+Variáveis de controle.
+"""
+SALVAR_RESULTADOS = True
+MOSTRAR_PLOT = True
+
+#%%
+"""
+Métodos de determinação de período. Cada um recebe (tempo, fluxo, periodos) e devolve
+o período estimado.
+"""
+def periodo_minimizacao(tempo, fluxo, periodos):
+    return periodos[np.argmin(comprimentos_lote(tempo, fluxo, periodos))]
+
+def periodo_maximizacao(tempo, fluxo, periodos):
+    return periodos[np.argmax(comprimentos_representativos(tempo, fluxo, periodos))]
+
+def periodo_pdm(tempo, fluxo, periodos):
+    return periodos[np.nanargmin(thetas_pdm(tempo, fluxo, periodos))]
+
+def periodo_caixa(tempo, fluxo, periodos, duracoes=(0.05, 0.1, 0.2)):
+    return busca_caixa(tempo, fluxo, None, None, None, duracoes, periodos=periodos)[0]
+
+METODOS = {'min': periodo_minimizacao, 'max': periodo_maximizacao, 'pdm': periodo_pdm, 'caixa': periodo_caixa}
+
+#%%
+"""
+Função que monta a tabela de tentativas: uma linha (periodo, profundidade, duracao,
+sigma) para cada combinação da grade, repetida 'repeticoes' vezes com ruídos
+diferentes.
+"""
+COLUNAS = ('periodo', 'profundidade', 'duracao', 'sigma')
+
+def tabela_injecoes(periodos, profundidades, duracoes, sigmas, repeticoes=1):
+    grade = np.meshgrid(periodos, profundidades, duracoes, sigmas, indexing='ij')
+    tabela = np.column_stack([eixo.ravel() for eixo in grade])
+    return np.repeat(tabela, repeticoes, axis=0)
+
+#%%
+"""
+Avaliação de um lote de tentativas. As curvas do lote são geradas juntas (sem ruído)
+e o ruído de cada tentativa vem da sua própria semente, SeedSequence(semente, i), então
+o resultado da tentativa i não depende do lote, do processo ou da ordem de execução.
+O tempo, o método e a grade de períodos teste são enviados uma única vez para cada
+processo.
+"""
+_CONFIGURACAO = {}
+
+def _configurar(tempo, metodo, periodos_teste, semente):
+    _CONFIGURACAO.update(tempo=tempo, metodo=metodo, periodos_teste=periodos_teste, semente=semente)
+
+def _avaliar_lote(argumentos):
+    indices, linhas = argumentos
+    tempo = _CONFIGURACAO['tempo']
+    metodo = METODOS[_CONFIGURACAO['metodo']]
+    fluxos = gerar_curvas(tempo, linhas[:, 1], linhas[:, 2], linhas[:, 0], 0.0)
+    recuperados = np.empty(len(indices))
+    for j, (i, linha, fluxo) in enumerate(zip(indices, linhas, fluxos)):
+        rng = np.random.default_rng(np.random.SeedSequence(_CONFIGURACAO['semente'], spawn_key=(int(i),)))
+        fluxo = fluxo + linha[3] * rng.standard_normal(len(fluxo))
+        recuperados[j] = metodo(tempo, fluxo, _CONFIGURACAO['periodos_teste'])
+    return indices, recuperados
+
+#%%
+"""
+Funções do arquivo de progresso. Os períodos recuperados ficam em um vetor com NaN nas
+tentativas ainda não avaliadas, junto com a tabela, a grade de períodos teste e a
+semente, para que um arquivo de outra configuração não seja continuado por engano. A
+gravação é atômica (gravacao.py).
+"""
+def carregar_progresso(caminho, tabela, periodos_teste, semente):
+    if os.path.exists(caminho):
+        with np.load(caminho) as dados:
+            if (np.array_equal(dados['tabela'], tabela) and np.array_equal(dados['periodos_teste'], periodos_teste)
+                    and dados['semente'] == semente):
+                return dados['recuperados'].copy()
+        raise ValueError(f"{caminho} pertence a outra configuração de injeções")
+    return np.full(len(tabela), np.nan)
+
+def salvar_progresso(caminho, tabela, periodos_teste, semente, recuperados):
+    gravar_atomico(caminho, lambda temporario: np.savez(temporario, tabela=tabela, periodos_teste=periodos_teste,
+                                                        semente=semente, recuperados=recuperados))
+
+#%%
+"""
+Função principal: avalia as tentativas que ainda não estão no arquivo de progresso,
+em lotes de tamanho_lote, e salva o progresso no máximo a cada intervalo_salvamento
+segundos (e ao final).
+"""
+def executar_injecoes(tabela, tempo, metodo, periodos_teste, caminho_progresso, workers=None, tamanho_lote=16,
+                      semente=0, intervalo_salvamento=60):
+    recuperados = carregar_progresso(caminho_progresso, tabela, periodos_teste, semente)
+    pendentes = np.flatnonzero(np.isnan(recuperados))
+    lotes = [(indices, tabela[indices]) for indices in np.array_split(pendentes, max(1, -(-len(pendentes) // tamanho_lote)))
+             if len(indices) > 0]
+    workers = 1 if workers is None else workers
+    ultimo_salvamento = time.perf_counter()
+    try:
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=contexto_processos(), initializer=_configurar,
+                                     initargs=(tempo, metodo, periodos_teste, semente)) as executor:
+                tarefas = [executor.submit(_avaliar_lote, lote) for lote in lotes]
+                for k, tarefa in enumerate(as_completed(tarefas)):
+                    indices, valores = tarefa.result()
+                    recuperados[indices] = valores
+                    if time.perf_counter() - ultimo_salvamento > intervalo_salvamento:
+                        salvar_progresso(caminho_progresso, tabela, periodos_teste, semente, recuperados)
+                        ultimo_salvamento = time.perf_counter()
+                        print(f'{k + 1} de {len(lotes)} lotes')
+        else:
+            _configurar(tempo, metodo, periodos_teste, semente)
+            for k, lote in enumerate(lotes):
+                indices, valores = _avaliar_lote(lote)
+                recuperados[indices] = valores
+                if time.perf_counter() - ultimo_salvamento > intervalo_salvamento:
+                    salvar_progresso(caminho_progresso, tabela, periodos_teste, semente, recuperados)
+                    ultimo_salvamento = time.perf_counter()
+                    print(f'{k + 1} de {len(lotes)} lotes')
+    finally:
+        salvar_progresso(caminho_progresso, tabela, periodos_teste, semente, recuperados)
+    return recuperados
+
+#%%
+"""
+Estatísticas de recuperação. Uma tentativa é recuperada quando o erro relativo do
+período é menor que a tolerância, e marcamos separadamente quando o período
+recuperado é um múltiplo ou submúltiplo (2 ou 3 vezes) do injetado. A completude é a
+fração de tentativas recuperadas em cada célula (periodo, profundidade, duracao, sigma).
+"""
+def estatisticas_recuperacao(tabela, recuperados, tolerancia=0.01, harmonicos=(2, 3)):
+    injetados = tabela[:, 0]
+    recuperado = np.abs(recuperados - injetados) / injetados < tolerancia
+    harmonico = np.zeros(len(tabela), dtype=bool)
+    for n in harmonicos:
+        for razao in (n, 1 / n):
+            harmonico |= np.abs(recuperados - razao * injetados) / (razao * injetados) < tolerancia
+    return recuperado, harmonico
+
+def mapa_completude(tabela, recuperado):
+    eixos = [np.unique(tabela[:, j]) for j in range(len(COLUNAS))]
+    celulas = [np.searchsorted(eixo, tabela[:, j]) for j, eixo in enumerate(eixos)]
+    forma = tuple(len(eixo) for eixo in eixos)
+    indices = np.ravel_multi_index(celulas, forma)
+    total = np.bincount(indices, minlength=np.prod(forma)).reshape(forma)
+    acertos = np.bincount(indices, recuperado.astype(float), np.prod(forma)).reshape(forma)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return eixos, acertos / total, total
+
+#%%
+"""
+Parâmetros da simulação. Usamos a mesma curva das simulações (5 dias com cadência de
+30 segundos) e uma grade de períodos teste com passo 0.005, que ainda resolve o vale
+do comprimento (≈ duracao * periodo / tempo total). Cada tentativa leva ~0.8 s em um
+núcleo, então 10^5 tentativas levam ~22 horas divididas pelo número de processos.
+"""
+tempo = np.arange(0, 5.0, 0.00035)
+metodo = 'min' # 'min' | 'max' | 'pdm' | 'caixa'
+periodos_teste = np.arange(0.5, 5.0, 0.005)
+periodos_injetados = np.linspace(0.6, 2.4, 7) # Pelo menos 2 trânsitos na curva
+profundidades = np.geomspace(0.0005, 0.01, 6)
+duracoes = np.array([0.05, 0.1, 0.2])
+sigmas = np.array([0.001, 0.003])
+repeticoes = 5
+workers = os.cpu_count()
+semente = 0
+diretorio_resultados = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'injecao_recuperacao')
+caminho_progresso = os.path.join(diretorio_resultados, f'progresso_{metodo}.npz')
+
+#%%
+"""
+Execução das injeções.
+"""
+os.makedirs(diretorio_resultados, exist_ok=True)
+tabela = tabela_injecoes(periodos_injetados, profundidades, duracoes, sigmas, repeticoes)
+recuperados = executar_injecoes(tabela, tempo, metodo, periodos_teste, caminho_progresso, workers, semente=semente)
+recuperado, harmonico = estatisticas_recuperacao(tabela, recuperados)
+eixos, completude, total = mapa_completude(tabela, recuperado)
+print(f'Recuperados: {np.mean(recuperado):.3f} | Harmônicos: {np.mean(harmonico):.3f} | Tentativas: {len(tabela)}')
+
+#%%
+if SALVAR_RESULTADOS:
+    np.savez(os.path.join(diretorio_resultados, f'completude_{metodo}.npz'), completude=completude, total=total,
+             **dict(zip(COLUNAS, eixos)))
+    with open(os.path.join(diretorio_resultados, f'tentativas_{metodo}.csv'), 'w', newline='') as arquivo:
+        escritor = csv.writer(arquivo)
+        escritor.writerow(COLUNAS + ('periodo_recuperado', 'recuperado', 'harmonico'))
+        for linha, valor, r, h in zip(tabela, recuperados, recuperado, harmonico):
+            escritor.writerow(list(linha) + [valor, int(r), int(h)])
+
+#%%
+"""
+Mapa de completude em função do período e da profundidade (média sobre as durações e
+os níveis de ruído).
+"""
+if MOSTRAR_PLOT:
+    plt.figure(figsize=(10, 6), dpi=200)
+    mapa = np.nansum(completude * total, axis=(2, 3)) / np.sum(total, axis=(2, 3))
+    plt.pcolormesh(eixos[0], eixos[1], mapa.T, shading='nearest', cmap='viridis', vmin=0, vmax=1)
+    plt.colorbar(label='Completude')
+    plt.yscale('log')
+    plt.xlabel('Período injetado (dias)')
+    plt.ylabel('Profundidade injetada')
+    plt.title(f'Mapa de Completude ({metodo})')
+    if SALVAR_RESULTADOS:
+        plt.savefig(os.path.join(diretorio_resultados, f'completude_{metodo}.png'))
+    plt.show()
@@ -0,0 +1,703 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Funções compartilhadas pelos métodos de determinação de período. Este arquivo não
+executa nenhuma simulação, ele apenas reúne as funções de dobragem e de comprimento
+de corda para que os códigos de minimização e maximização possam importá-las:
+    from motor_periodo import minimizar_comprimento_CL
+"""
+#%%
+import numpy as np
+import multiprocessing as mp
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+#%%
+"""
+Memória máxima (em bytes) utilizada pelos temporários de um bloco de períodos teste.
+"""
+MEMORIA_MAX = 2**28 # 256 MB
+FOLGA_MEMORIA = 2**16 # Reserva para objetos pequenos (cabeçalhos dos vetores, etc.)
+
+#%%
+"""
+Função responsável por realizar a superposição dos pontos da curva de luz (CL) em uma
+única curva no intervalo [0, periodo].
+"""
+def dobrar_CL(tempo, fluxo, periodo):
+    fase = (tempo % periodo)  # Calcula a fase de cada ponto
+    fase_ordem = np.argsort(fase)  # Ordena as fases em ordem crescente
+    return fase[fase_ordem], fluxo[fase_ordem]
+
+#%%
+"""
+Dobragem que aproveita a ordenação do tempo. Como o vetor de tempo já está em ordem
+crescente, as fases de cada ciclo (tempo // periodo) formam uma sequência já ordenada,
+e a CL dobrada é a intercalação (k-way merge) de aproximadamente T/P dessas sequências.
+A ordenação estável do numpy (timsort) detecta essas sequências e apenas as intercala,
+em vez de ordenar tudo do zero como o quicksort de np.argsort. O resultado é o mesmo de
+dobrar_CL (a menos da ordem entre fases exatamente iguais).
+Também é possível partir da ordem do período teste anterior (ordem_anterior), que para
+períodos vizinhos é quase a ordem correta. Nas nossas medições
+(desempenho/benchmark_dobra.py) essa opção não foi mais rápida que a intercalação,
+pois o acesso fora de ordem ao vetor de fases custa mais do que ela economiza.
+"""
+def dobrar_CL_corridas(tempo, fluxo, periodo, ordem_anterior=None, retornar_ordem=False):
+    fase = (tempo % periodo)  # Calcula a fase de cada ponto
+    if ordem_anterior is None:
+        fase_ordem = np.argsort(fase, kind='stable')  # Intercala as sequências de cada ciclo
+    else:
+        fase_ordem = ordem_anterior[np.argsort(fase[ordem_anterior], kind='stable')]
+    if retornar_ordem:
+        return fase[fase_ordem], fluxo[fase_ordem], fase_ordem
+    return fase[fase_ordem], fluxo[fase_ordem]
+
+#%%
+"""
+Função para calcular o comprimento de uma curva de luz (CL). Fazemos isso calculando
+a distancia (euclidiana em um espaço bidimensional) entre dois pontos consecutivos
+varrendo sobre todos os pontos da CL. Ao final somamos todos os comprimentos para
+obter o comprimento total da CL.
+"""
+def comprimento_CL(tempo, fluxo):
+    curva = np.column_stack((tempo, fluxo)) # Malha bidimensional da CL
+    variacao = np.diff(curva, axis=0) # Diferença entre componentes dos pontos consecutivos
+    distancias = np.linalg.norm(variacao, axis=1) # Norma entre pontos consecutivos
+    return np.sum(distancias)
+
+#%%
+"""
+Função que determina quantos períodos teste cabem em um bloco sem ultrapassar a
+memória máxima. Cada período teste de uma CL com N pontos ocupa aproximadamente 7
+vetores de N elementos (fase, ordem, fase e fluxo ordenados, as duas diferenças e as
+distâncias): a ordem sempre com 8 bytes e os demais com o tamanho do tipo usado.
+"""
+def bytes_por_ponto(tamanho_item=8):
+    return 8 + 6 * tamanho_item
+
+def tamanho_bloco(num_pontos, memoria_max=MEMORIA_MAX, tamanho_item=8):
+    bytes_por_periodo = bytes_por_ponto(tamanho_item) * max(num_pontos, 1)
+    return max(1, int((memoria_max - FOLGA_MEMORIA) // bytes_por_periodo))
+
+#%%
+"""
+Função que calcula o comprimento da CL dobrada para um bloco de períodos teste de uma
+única vez. Construímos a matriz de fases (um período por linha), ordenamos cada linha
+e calculamos as distâncias entre pontos consecutivos ao longo do último eixo. O
+resultado é idêntico a chamar dobrar_CL_corridas e comprimento_CL para cada período.
+"""
+def comprimentos_bloco(tempo, fluxo, periodos):
+    fases = tempo[np.newaxis, :] % periodos[:, np.newaxis] # Matriz de fases (B, N)
+    ordem = np.argsort(fases, axis=-1, kind='stable') # Intercalação dos ciclos de cada linha
+    fases = np.take_along_axis(fases, ordem, axis=-1)
+    fluxos = fluxo[ordem]
+    dx = np.diff(fases, axis=-1)
+    dy = np.diff(fluxos, axis=-1)
+    return np.sum(np.sqrt(dx*dx + dy*dy), axis=-1, dtype=np.float64)
+
+#%%
+"""
+Avaliação em pedaços para curvas com milhões de pontos, quando nem um único período
+cabe na memória máxima com comprimentos_bloco. Para cada período guardamos apenas a
+fase (em um vetor alocado uma única vez) e a ordem da dobragem; o comprimento é somado
+percorrendo a CL dobrada em pedaços de C pontos, sempre com os mesmos 4 vetores de
+trabalho (fase e fluxo ordenados, dx e dy) que são reaproveitados a cada pedaço e a
+cada período. A memória de trabalho fica em 24 bytes por ponto (fase, ordem e o vetor
+auxiliar da ordenação) mais os vetores dos pedaços, independente do tamanho da grade.
+"""
+def memoria_minima(num_pontos, tamanho_item=8):
+    # Fase, ordem e vetor auxiliar do timsort (até N índices) por ponto, e 4 vetores de 2 pontos
+    return (tamanho_item + 8 + 8) * num_pontos + 4 * tamanho_item * 2 + FOLGA_MEMORIA
+
+def comprimentos_em_pedacos(tempo, fluxo, periodos, memoria_max=MEMORIA_MAX):
+    num_pontos = len(tempo)
+    tamanho_item = tempo.dtype.itemsize
+    minimo = memoria_minima(num_pontos, tamanho_item)
+    if memoria_max < minimo:
+        raise ValueError(f"memoria_max = {memoria_max} bytes não é suficiente para {num_pontos} pontos "
+                         f"(mínimo de {minimo} bytes)")
+    pedaco = int(min(max(num_pontos - 1, 1), (memoria_max - minimo) // (4 * tamanho_item) + 1))
+    fase = np.empty(num_pontos, dtype=tempo.dtype)
+    fase_ordenada = np.empty(pedaco + 1, dtype=tempo.dtype)
+    fluxo_ordenado = np.empty(pedaco + 1, dtype=tempo.dtype)
+    dx, dy = np.empty(pedaco, dtype=tempo.dtype), np.empty(pedaco, dtype=tempo.dtype)
+    comprimentos = np.empty(len(periodos))
+    for i, periodo in enumerate(periodos):
+        np.remainder(tempo, periodo, out=fase)
+        ordem = np.argsort(fase, kind='stable')
+        total = 0.0
+        for inicio in range(0, num_pontos - 1, pedaco):
+            n = min(pedaco, num_pontos - 1 - inicio) # Número de distâncias neste pedaço
+            indices = ordem[inicio:inicio + n + 1] # Um ponto de sobreposição com o pedaço seguinte
+            np.take(fase, indices, out=fase_ordenada[:n + 1])
+            np.take(fluxo, indices, out=fluxo_ordenado[:n + 1])
+            np.subtract(fase_ordenada[1:n + 1], fase_ordenada[:n], out=dx[:n])
+            np.subtract(fluxo_ordenado[1:n + 1], fluxo_ordenado[:n], out=dy[:n])
+            np.multiply(dx[:n], dx[:n], out=dx[:n])
+            np.multiply(dy[:n], dy[:n], out=dy[:n])
+            np.add(dx[:n], dy[:n], out=dx[:n])
+            np.sqrt(dx[:n], out=dx[:n])
+            total += np.sum(dx[:n], dtype=np.float64)
+        del ordem
+        comprimentos[i] = total
+    return comprimentos
+
+#%%
+"""
+Função que percorre todos os períodos teste em blocos cujo tamanho é definido pela
+memória máxima, evitando o laço em Python período a período. Se nem um período cabe
+na memória máxima (7 vetores de N pontos), a CL é percorrida em pedaços. Em ambos os
+casos a memória de trabalho fica abaixo de memoria_max (sem contar os vetores de
+entrada), qualquer que seja o tamanho da CL ou da grade. O tipo (dtype) define a
+precisão das contas; a soma dos comprimentos é sempre feita em float64.
+"""
+def comprimentos_lote(tempo, fluxo, periodos, memoria_max=MEMORIA_MAX, dtype=np.float64):
+    tempo = np.asarray(tempo, dtype=dtype)
+    fluxo = np.asarray(fluxo, dtype=dtype)
+    periodos = np.asarray(periodos, dtype=dtype)
+    tamanho_item = tempo.dtype.itemsize
+    if bytes_por_ponto(tamanho_item) * len(tempo) + FOLGA_MEMORIA > memoria_max:
+        return comprimentos_em_pedacos(tempo, fluxo, periodos, memoria_max)
+    comprimentos = np.empty(len(periodos))
+    bloco = tamanho_bloco(len(tempo), memoria_max, tamanho_item)
+    for inicio in range(0, len(periodos), bloco):
+        fim = inicio + bloco
+        comprimentos[inicio:fim] = comprimentos_bloco(tempo, fluxo, periodos[inicio:fim])
+    return comprimentos
+
+#%%
+"""
+Modo de precisão reduzida (float32). Os tempos em BTJD são números grandes (~2000
+dias) e em float32 só têm ~7 algarismos significativos, então antes da conversão
+subtraímos uma época de referência (o primeiro tempo). Depois disso o erro de um tempo
+é de ~tempo_total * eps, e a fase é confiável se esse erro for pequeno perto da
+cadência: para um setor do TESS (27 dias) o erro é de ~3e-6 dias, contra 1.4e-3 dias
+da cadência de 2 minutos. Em float32 cada período teste ocupa 32 bytes por ponto em
+vez de 56, então cabem quase o dobro de períodos por bloco e o tráfego de memória cai
+pela metade.
+"""
+TOLERANCIA_FASE = 0.1 # Erro máximo do tempo em float32, em frações da cadência mediana
+
+def float32_adequado(tempo):
+    tempo = np.asarray(tempo, dtype=float)
+    if len(tempo) < 2:
+        return True
+    tempo_total = np.max(tempo) - np.min(tempo)
+    diferencas = np.diff(tempo)
+    if np.any(diferencas < 0): # Tempo fora de ordem
+        diferencas = np.diff(np.sort(tempo))
+    cadencia = np.median(diferencas, overwrite_input=True)
+    return 2 * tempo_total * np.finfo(np.float32).eps <= TOLERANCIA_FASE * cadencia
+
+#%%
+"""
+Função que calcula os comprimentos em float32 e valida o resultado: o período de
+menor comprimento e mais alguns períodos da grade são recalculados em float64 (com o
+mesmo tempo re-referenciado). O erro relativo no período de menor comprimento e a
+mediana do erro nos demais devem ficar abaixo da tolerância. Usamos a mediana porque
+nos períodos múltiplos da cadência pontos de ciclos diferentes têm a mesma fase, e o
+arredondamento troca a ordem desses empates (o comprimento muda alguns %, mas a ordem
+dos empates já é arbitrária em float64). Se a curva for longa demais para o float32,
+se a validação falhar ou se as cópias do modo float32 não deixarem memória suficiente,
+a grade inteira é calculada em float64 com o tempo original, como sem esse modo.
+As cópias (o tempo re-referenciado em float64 e o tempo e o fluxo em float32, 16 bytes
+por ponto) são descontadas de memoria_max, então a memória total fica abaixo do mesmo
+limite da busca em float64. Retorna os comprimentos e se o float32 foi utilizado.
+"""
+def comprimentos_precisao_reduzida(tempo, fluxo, periodos, memoria_max=MEMORIA_MAX, num_validacao=8,
+                                   tolerancia=1e-4):
+    tempo = np.asarray(tempo, dtype=float)
+    fluxo = np.asarray(fluxo, dtype=float)
+    periodos = np.asarray(periodos, dtype=float)
+    livre = memoria_max - (8 + 4 + 4) * len(tempo)
+    if not float32_adequado(tempo) or livre < memoria_minima(len(tempo), 4):
+        return comprimentos_lote(tempo, fluxo, periodos, memoria_max), False
+
+    referenciado = tempo - tempo[0] # Época de referência
+    comprimentos = comprimentos_lote(referenciado.astype(np.float32), fluxo.astype(np.float32), periodos, livre,
+                                     dtype=np.float32)
+    indice_menor = np.argmin(comprimentos)
+    indices = np.append(indice_menor, np.linspace(0, len(periodos) - 1, num_validacao).astype(int))
+    referencia = comprimentos_lote(referenciado, fluxo, periodos[indices], memoria_max - referenciado.nbytes)
+    del referenciado
+    erro = np.abs(comprimentos[indices] - referencia) / np.abs(referencia)
+    if not (erro[0] <= tolerancia and np.median(erro) <= tolerancia):
+        return comprimentos_lote(tempo, fluxo, periodos, memoria_max), False
+    return comprimentos, True
+
+#%%
+"""
+Cobertura de fase. Nas CLs reais do TESS há uma lacuna no meio de cada setor e entre
+os setores, então em alguns períodos teste a CL dobrada (dobrar_CL) cobre só parte da
+fase, e o comprimento fica menor apenas porque a fase percorrida é menor. A cobertura
+pode ser calculada sem dobrar os pontos: basta dobrar os intervalos observados
+(segmentos entre lacunas). Um segmento [a, b] mais longo que o período cobre toda a
+fase; os demais vão para [a % P, a % P + (b - a)], divididos em dois quando passam de
+P. O comprimento da união dos intervalos sai de uma única passada depois de ordenar
+os inícios: cada intervalo acrescenta apenas a parte que passa do maior fim anterior,
+    união = Σ max(0, fim_i - max(inicio_i, max(fim_0, ..., fim_{i-1})))
+e o custo é O(S log S) por período, para S segmentos, em vez de O(N).
+"""
+def segmentos_observacao(tempo, lacuna_min=None):
+    tempo = np.sort(np.asarray(tempo, dtype=float))
+    diferencas = np.diff(tempo)
+    if lacuna_min is None:
+        # Alguns pontos removidos (flags de qualidade, NaN) não contam como lacuna
+        lacuna_min = 10 * np.median(diferencas) if len(diferencas) > 0 else np.inf
+    lacunas = np.flatnonzero(diferencas > lacuna_min)
+    inicios = tempo[np.concatenate(([0], lacunas + 1))]
+    fins = tempo[np.concatenate((lacunas, [len(tempo) - 1]))]
+    return inicios, fins
+
+def cobertura_fase_bloco(inicios, fins, periodos):
+    periodos = periodos[:, np.newaxis]
+    duracoes = (fins - inicios)[np.newaxis, :]
+    comeco = inicios[np.newaxis, :] % periodos
+    fim = comeco + duracoes
+    # Parte de cada segmento que passa da fase P volta para o início da fase
+    excesso = np.clip(fim - periodos, 0, None)
+    comeco = np.concatenate((comeco, np.zeros_like(excesso)), axis=1)
+    fim = np.concatenate((np.minimum(fim, periodos), excesso), axis=1)
+    ordem = np.argsort(comeco, axis=1)
+    comeco = np.take_along_axis(comeco, ordem, axis=1)
+    fim = np.take_along_axis(fim, ordem, axis=1)
+    fim_anterior = np.concatenate((np.full((len(periodos), 1), -np.inf),
+                                   np.maximum.accumulate(fim, axis=1)[:, :-1]), axis=1)
+    uniao = np.sum(np.clip(fim - np.maximum(comeco, fim_anterior), 0, None), axis=1)
+    completo = np.any(duracoes >= periodos, axis=1)
+    return np.where(completo, 1.0, np.minimum(uniao / periodos[:, 0], 1.0))
+
+def cobertura_fase(tempo, periodos, lacuna_min=None, memoria_max=MEMORIA_MAX):
+    inicios, fins = segmentos_observacao(tempo, lacuna_min)
+    periodos = np.asarray(periodos, dtype=float)
+    coberturas = np.empty(len(periodos))
+    # ~10 vetores de 2S elementos por período
+    bloco = max(1, int(memoria_max // (10 * 8 * 2 * len(inicios))))
+    for inicio in range(0, len(periodos), bloco):
+        fim = inicio + bloco
+        coberturas[inicio:fim] = cobertura_fase_bloco(inicios, fins, periodos[inicio:fim])
+    return coberturas
+
+#%%
+"""
+Função responsável por encontrar o período, se ele existe, de uma curva de luz (CL).
+Fazemos isso realizando a superposição da CL por um período teste, fazemos esse
+período teste variar de um limite minímo até o tempo total da CL. O período
+responsável por minimizar o comprimento da CL será o período real.
+Com precisao='float32' a varredura serial usa o modo de precisão reduzida. Com
+cobertura_min os períodos cuja CL dobrada cobre uma fração menor da fase não são
+avaliados e ficam com NaN no vetor de comprimentos; se nenhum período alcança
+cobertura_min, o período e o menor comprimento devolvidos são NaN.
+"""
+def minimizar_comprimento_CL(tempo, fluxo, periodo_min, periodo_max, dp, memoria_max=MEMORIA_MAX,
+                             workers=None, periodos=None, precisao='float64', cobertura_min=None):
+    if periodos is None:
+        periodos = np.arange(periodo_min, periodo_max, dp)
+    periodos = np.asarray(periodos, dtype=float)
+    avaliados = np.ones(len(periodos), dtype=bool)
+    if cobertura_min is not None:
+        avaliados = cobertura_fase(tempo, periodos, memoria_max=memoria_max) >= cobertura_min
+    comprimentos = np.full(len(periodos), np.nan)
+    if not np.any(avaliados):
+        return np.nan, periodos, np.nan, comprimentos
+    if precisao == 'float32' and (workers is None or workers <= 1):
+        comprimentos[avaliados], _ = comprimentos_precisao_reduzida(tempo, fluxo, periodos[avaliados], memoria_max)
+    elif workers is not None and workers > 1:
+        comprimentos[avaliados] = comprimentos_paralelo(tempo, fluxo, periodos[avaliados], 'min', workers, memoria_max)
+    else:
+        comprimentos[avaliados] = comprimentos_lote(tempo, fluxo, periodos[avaliados], memoria_max)
+
+    indice_menor = np.nanargmin(comprimentos) # Indíce associado ao menor comprimento
+    return periodos[indice_menor], periodos, comprimentos[indice_menor], comprimentos
+
+#%%
+"""
+Função para cálcular os pontos representativos de uma curva de luz (CL) dentro
+de uma determinada partição temporal. Realizamos o particionamento do eixo temporal
+em M partições, após isso realizamos a média de todos os pontos dentro de uma
+partição fazendo isso para todas as partições, assim trocamos N pontos da CL por
+M<<N pontos representativos da CL por partição temporal.
+As médias são obtidas em uma única passada: np.bincount soma o tempo, o fluxo e a
+quantidade de pontos de cada partição, em vez de selecionar cada partição com uma
+máscara sobre o vetor inteiro (O(N) em vez de O(N·√N)). Partições vazias são
+descartadas, no lugar de produzir np.mean([]) = NaN.
+"""
+def CL_representativa(tempo, fluxo):
+    num_pontos = len(tempo)
+    num_particoes = int(np.trunc(np.sqrt(num_pontos)))
+    particoes = np.linspace(np.min(tempo), np.max(tempo), num_particoes + 1)
+    # Retorna, para cada ponto de tempo, o índice da partição à qual ele pertence. O
+    # índice num_particoes fica com o ponto igual ao limite superior, que (como no
+    # np.digitize) não pertence a nenhuma partição e é descartado.
+    indices_particoes = np.digitize(tempo, particoes) - 1
+    contagens = np.bincount(indices_particoes, minlength=num_particoes + 1)[:num_particoes]
+    soma_tempo = np.bincount(indices_particoes, weights=tempo, minlength=num_particoes + 1)[:num_particoes]
+    soma_fluxo = np.bincount(indices_particoes, weights=fluxo, minlength=num_particoes + 1)[:num_particoes]
+    ocupadas = contagens > 0
+    return soma_tempo[ocupadas] / contagens[ocupadas], soma_fluxo[ocupadas] / contagens[ocupadas]
+
+#%%
+"""
+Função que calcula o comprimento normalizado (comprimento / período) da CL formada
+pelos pontos representativos da CL dobrada, para cada período teste.
+"""
+def comprimentos_representativos(tempo, fluxo, periodos):
+    comprimentos = np.empty(len(periodos))
+    for i, periodo in enumerate(periodos):
+        fase, fluxo_dobrado = dobrar_CL(tempo, fluxo, periodo)
+        fase_representativa, fluxo_representativo = CL_representativa(fase, fluxo_dobrado)
+        # Normalizamos os comprimento da CL para observar os detalhes
+        comprimentos[i] = comprimento_CL(fase_representativa, fluxo_representativo) / periodo
+    return comprimentos
+
+#%%
+"""
+Função responsável por encotrar o período, se ele existir, de uma curva de luz (CL).
+Fazemos isso realizando a dobragem da CL por um período teste, fazemos esse período
+variar de um período minímo até um tempo total da CL, após isso realizamos a
+substituição da CL por seus pontos representativos por partição temporal. O período
+responsável por maximizar o comprimento da CL será o período real.
+"""
+def maximizar_comprimento_CL(tempo, fluxo, periodo_min, periodo_max, dp, workers=None, periodos=None):
+    if periodos is None:
+        periodos = np.arange(periodo_min, periodo_max, dp)
+    if workers is not None and workers > 1:
+        comprimentos = comprimentos_paralelo(tempo, fluxo, periodos, 'max', workers)
+    else:
+        comprimentos = comprimentos_representativos(tempo, fluxo, periodos)
+
+    indice_maior = np.argmax(comprimentos) # Indíce associado ao maior comprimento
+    return periodos[indice_maior], periodos, comprimentos[indice_maior], comprimentos
+
+#%%
+"""
+Somas por partição de fase. Para um bloco de períodos teste a fase de cada ponto é
+dividida em M partições e três np.bincount com o índice (linha do período, partição)
+dão a quantidade de pontos, a soma do fluxo e a soma do fluxo ao quadrado de cada
+partição. As somas não dependem da ordem dos pontos, então não é preciso ordenar a
+fase, e os pontos podem ser somados em pedaços. Cada pedaço usa o índice e o peso de
+cada ponto (16 bytes por ponto e período) e as somas ocupam 3 vetores de M elementos
+por período, mais o resultado de um np.bincount; se a CL inteira não cabe na memória
+máxima junto com as somas, ela é percorrida em pedaços. bloco_particoes dá quantos
+períodos cabem em um bloco, contando também os vetores de M elementos que quem chama
+usa depois com as somas.
+"""
+def bloco_particoes(num_pontos, num_particoes, memoria_max=MEMORIA_MAX, vetores_particao=8):
+    bytes_por_periodo = 16 * max(num_pontos, 1) + 8 * vetores_particao * num_particoes
+    return max(1, int((memoria_max - FOLGA_MEMORIA) // bytes_por_periodo))
+
+def somas_particoes(tempo, fluxo, periodos, num_particoes, memoria_max=MEMORIA_MAX):
+    num_periodos, num_pontos = len(periodos), len(tempo)
+    tamanho = num_periodos * num_particoes
+    livre = memoria_max - FOLGA_MEMORIA - 4 * 8 * tamanho # As três somas e um np.bincount
+    pedaco = int(min(max(num_pontos, 1), livre // (16 * max(num_periodos, 1))))
+    if pedaco < 1:
+        raise ValueError(f"memoria_max = {memoria_max} bytes não é suficiente para {num_periodos} períodos "
+                         f"com {num_particoes} partições")
+    contagens, soma, soma2 = np.zeros(tamanho), np.zeros(tamanho), np.zeros(tamanho)
+    linhas = num_particoes * np.arange(num_periodos)[:, np.newaxis]
+    for inicio in range(0, num_pontos, pedaco):
+        fases = tempo[np.newaxis, inicio:inicio + pedaco] % periodos[:, np.newaxis]
+        fases /= periodos[:, np.newaxis] # Fase entre 0 e 1
+        fases *= num_particoes
+        indices = fases.astype(np.int64)
+        del fases
+        np.minimum(indices, num_particoes - 1, out=indices)
+        indices += linhas
+        indices = indices.ravel()
+        pesos = np.tile(fluxo[inicio:inicio + pedaco], num_periodos)
+        contagens += np.bincount(indices, minlength=tamanho)
+        soma += np.bincount(indices, pesos, tamanho)
+        np.multiply(pesos, pesos, out=pesos)
+        soma2 += np.bincount(indices, pesos, tamanho)
+    forma = (num_periodos, num_particoes)
+    return contagens.reshape(forma), soma.reshape(forma), soma2.reshape(forma)
+
+#%%
+"""
+Método de minimização da dispersão de fase (PDM). A CL dobrada é dividida em M
+partições de fase e comparamos a variância do fluxo dentro das partições com a
+variância total:
+    θ = [Σ (Σf² - (Σf)²/n) / (N - M)] / [(Σf² - (Σf)²/N) / (N - 1)]
+onde M é o número de partições ocupadas. No período real os pontos de cada partição
+têm fluxos parecidos e θ é mínimo. As somas de cada partição saem de somas_particoes.
+"""
+def theta_pdm(contagens, soma, soma2):
+    total = np.sum(contagens, axis=-1)
+    ocupadas = np.sum(contagens > 0, axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        dentro = np.sum(soma2 - np.where(contagens > 0, soma*soma / contagens, 0), axis=-1) / (total - ocupadas)
+        variancia = (np.sum(soma2, axis=-1) - np.sum(soma, axis=-1)**2 / total) / (total - 1)
+        return dentro / variancia
+
+def thetas_pdm_bloco(tempo, fluxo, periodos, num_particoes, memoria_max=MEMORIA_MAX):
+    return theta_pdm(*somas_particoes(tempo, fluxo, periodos, num_particoes, memoria_max))
+
+#%%
+"""
+Função que calcula θ para todos os períodos teste, em blocos limitados pela memória
+máxima (bloco_particoes). O fluxo médio é subtraído antes para que Σf² - (Σf)²/n não
+perca precisão. O número padrão de partições é √N, como na CL representativa.
+"""
+def thetas_pdm(tempo, fluxo, periodos, num_particoes=None, memoria_max=MEMORIA_MAX):
+    tempo = np.asarray(tempo, dtype=float)
+    fluxo = np.asarray(fluxo, dtype=float)
+    fluxo = fluxo - np.mean(fluxo)
+    memoria_max -= fluxo.nbytes # A cópia do fluxo também ocupa a memória
+    periodos = np.asarray(periodos, dtype=float)
+    if num_particoes is None:
+        num_particoes = max(1, int(np.sqrt(len(tempo))))
+    thetas = np.empty(len(periodos))
+    bloco = bloco_particoes(len(tempo), num_particoes, memoria_max)
+    for inicio in range(0, len(periodos), bloco):
+        fim = inicio + bloco
+        thetas[inicio:fim] = thetas_pdm_bloco(tempo, fluxo, periodos[inicio:fim], num_particoes, memoria_max)
+    return thetas
+
+def minimizar_pdm(tempo, fluxo, periodo_min, periodo_max, dp, num_particoes=None, memoria_max=MEMORIA_MAX,
+                  workers=None, periodos=None):
+    if periodos is None:
+        periodos = np.arange(periodo_min, periodo_max, dp)
+    if workers is not None and workers > 1:
+        thetas = comprimentos_paralelo(tempo, fluxo, periodos, 'pdm', workers, memoria_max,
+                                       num_particoes=num_particoes)
+    else:
+        thetas = thetas_pdm(tempo, fluxo, periodos, num_particoes, memoria_max)
+
+    indice_menor = np.nanargmin(thetas) # Indíce associado ao menor θ
+    return periodos[indice_menor], periodos, thetas[indice_menor], thetas
+
+#%%
+"""
+Varredura paralela dos períodos teste. A grade de períodos é dividida em fragmentos
+contíguos que são avaliados por um conjunto de processos. Os vetores de tempo e fluxo
+são copiados uma única vez para uma memória compartilhada (multiprocessing.shared_memory)
+e cada processo apenas se conecta a ela, em vez de receber sua própria cópia. Os
+fragmentos são devolvidos na ordem da grade, então o vetor de comprimentos final não
+depende da ordem em que os processos terminam.
+O conjunto de processos com a memória compartilhada é um gerenciador de contexto
+(processos_compartilhados), usado também por outras varreduras (falso_alarme.py): as
+funções executadas nos processos obtêm os vetores com vetores_compartilhados().
+"""
+_MEMORIA_PROCESSO = {}
+
+# Os códigos de simulação não possuem 'if __name__ == "__main__"', então usamos 'fork'
+# (quando disponível) para que os processos não executem o código principal novamente
+def contexto_processos():
+    if 'fork' in mp.get_all_start_methods():
+        return mp.get_context('fork')
+    return mp.get_context()
+
+def _conectar_memoria(nome_tempo, nome_fluxo, num_pontos):
+    for chave, nome in (('tempo', nome_tempo), ('fluxo', nome_fluxo)):
+        memoria = shared_memory.SharedMemory(name=nome)
+        _MEMORIA_PROCESSO[chave + '_shm'] = memoria # Mantém a conexão aberta
+        _MEMORIA_PROCESSO[chave] = np.ndarray((num_pontos,), dtype=np.float64, buffer=memoria.buf)
+
+def vetores_compartilhados():
+    return _MEMORIA_PROCESSO['tempo'], _MEMORIA_PROCESSO['fluxo']
+
+@contextmanager
+def processos_compartilhados(tempo, fluxo, workers):
+    tempo = np.ascontiguousarray(tempo, dtype=np.float64)
+    fluxo = np.ascontiguousarray(fluxo, dtype=np.float64)
+    memorias = []
+    try:
+        for vetor in (tempo, fluxo):
+            memoria = shared_memory.SharedMemory(create=True, size=max(vetor.nbytes, 1))
+            memorias.append(memoria)
+            np.ndarray(vetor.shape, dtype=np.float64, buffer=memoria.buf)[:] = vetor
+        with ProcessPoolExecutor(max_workers=workers, mp_context=contexto_processos(),
+                                 initializer=_conectar_memoria,
+                                 initargs=(memorias[0].name, memorias[1].name, len(tempo))) as executor:
+            yield executor
+    finally:
+        for memoria in memorias:
+            memoria.close()
+            memoria.unlink()
+
+def _comprimentos_fragmento(argumentos):
+    metodo, periodos, memoria_max, parametros = argumentos
+    tempo, fluxo = vetores_compartilhados()
+    if metodo == 'min':
+        return comprimentos_lote(tempo, fluxo, periodos, memoria_max)
+    elif metodo == 'max':
+        return comprimentos_representativos(tempo, fluxo, periodos)
+    elif metodo == 'pdm':
+        return thetas_pdm(tempo, fluxo, periodos, memoria_max=memoria_max, **parametros)
+    raise ValueError(f"Método desconhecido: {metodo}")
+
+def comprimentos_paralelo(tempo, fluxo, periodos, metodo, workers, memoria_max=MEMORIA_MAX,
+                          fragmentos_por_processo=4, **parametros):
+    periodos = np.asarray(periodos, dtype=float)
+    if len(periodos) == 0:
+        return np.empty(0)
+    num_fragmentos = min(len(periodos), workers * fragmentos_por_processo)
+    fragmentos = np.array_split(periodos, num_fragmentos)
+    # Cada processo mantém um bloco, então a memória por processo é dividida
+    memoria_processo = max(memoria_max // workers, 1)
+
+    with processos_compartilhados(tempo, fluxo, workers) as executor:
+        tarefas = [(metodo, fragmento, memoria_processo, parametros) for fragmento in fragmentos]
+        # executor.map devolve os resultados na ordem dos fragmentos
+        resultados = list(executor.map(_comprimentos_fragmento, tarefas))
+    return np.concatenate(resultados)
+
+#%%
+"""
+Busca adaptativa (do grosso para o fino) do período. Em vez de avaliar toda a grade
+com o passo mais fino, fazemos uma varredura grossa com passo dp_grosso, guardamos os
+k melhores extremos locais (mínimos para 'min' e máximos para 'max') e refinamos ao
+redor de cada um com um passo 'fator' vezes menor, repetindo até atingir dp_alvo. O
+passo grosso ainda precisa resolver a largura do vale (ou pico) do comprimento,
+que é da ordem de duracao * periodo / (tempo total da CL).
+A função retorna, além da tupla usual (com os períodos avaliados em ordem crescente),
+a precisão final e o número de períodos avaliados.
+"""
+def _extremos_locais(valores, k, maximo):
+    sinal = -1.0 if maximo else 1.0
+    v = sinal * np.asarray(valores)
+    # Um ponto é extremo local se não for pior que nenhum dos vizinhos
+    esquerda = np.concatenate(([np.inf], v[:-1]))
+    direita = np.concatenate((v[1:], [np.inf]))
+    indices = np.flatnonzero((v <= esquerda) & (v <= direita))
+    return indices[np.argsort(v[indices], kind='stable')[:k]]
+
+def busca_adaptativa_CL(tempo, fluxo, periodo_min, periodo_max, dp_grosso, dp_alvo, metodo='min',
+                        k=5, fator=10, memoria_max=MEMORIA_MAX):
+    if metodo == 'min':
+        avaliar = lambda periodos: comprimentos_lote(tempo, fluxo, periodos, memoria_max)
+    elif metodo == 'max':
+        avaliar = lambda periodos: comprimentos_representativos(tempo, fluxo, periodos)
+    else:
+        raise ValueError(f"Método desconhecido: {metodo}")
+    maximo = metodo == 'max'
+
+    periodos = np.arange(periodo_min, periodo_max, dp_grosso)
+    comprimentos = avaliar(periodos)
+    todos_periodos = [periodos]
+    todos_comprimentos = [comprimentos]
+    dp = dp_grosso
+    while dp > dp_alvo:
+        centros = periodos[_extremos_locais(comprimentos, k, maximo)]
+        dp_novo = max(dp / fator, dp_alvo)
+        # Janela de ± dp ao redor de cada extremo, com o novo passo
+        janelas = [np.arange(max(c - dp, periodo_min), min(c + dp, periodo_max), dp_novo) for c in centros]
+        periodos = np.unique(np.concatenate(janelas))
+        comprimentos = avaliar(periodos)
+        todos_periodos.append(periodos)
+        todos_comprimentos.append(comprimentos)
+        dp = dp_novo
+
+    periodos = np.concatenate(todos_periodos)
+    comprimentos = np.concatenate(todos_comprimentos)
+    ordem = np.argsort(periodos, kind='stable')
+    periodos, comprimentos = periodos[ordem], comprimentos[ordem]
+    indice = np.argmax(comprimentos) if maximo else np.argmin(comprimentos)
+    return periodos[indice], periodos, comprimentos[indice], comprimentos, dp, len(periodos)
+
+#%%
+"""
+Busca de período para várias curvas de luz ao mesmo tempo. As curvas ficam em um
+contêiner irregular: os tempos e fluxos de todos os alvos concatenados em dois vetores
+e um vetor de deslocamentos (offsets) com o início de cada alvo, de forma que o alvo k
+ocupa as posições offsets[k]:offsets[k+1]. Assim não precisamos de um laço em Python
+por alvo, todos são dobrados com a mesma grade de períodos de uma única vez.
+"""
+def concatenar_curvas(tempos, fluxos):
+    tamanhos = [len(tempo) for tempo in tempos]
+    if min(tamanhos, default=0) == 0:
+        raise ValueError("Todas as curvas de luz precisam ter pelo menos um ponto")
+    offsets = np.concatenate(([0], np.cumsum(tamanhos))).astype(np.int64)
+    tempo = np.concatenate([np.asarray(t, dtype=float) for t in tempos])
+    fluxo = np.concatenate([np.asarray(f, dtype=float) for f in fluxos])
+    return tempo, fluxo, offsets
+
+#%%
+"""
+Função que calcula o comprimento de todas as curvas dobradas para um bloco de períodos.
+Para ordenar cada alvo separadamente com uma única ordenação usamos a chave
+    alvo * periodo + fase
+que, como 0 ≤ fase < periodo, mantém cada alvo no seu trecho do vetor (o trecho
+offsets[k]:offsets[k+1]). As diferenças entre o último ponto de um alvo e o primeiro
+do seguinte são zeradas e os comprimentos de cada alvo são somados por segmento com
+np.add.reduceat. O resultado coincide com a busca alvo a alvo, a menos de fases que
+difiram menos que a precisão de alvo * periodo (~1e-12 P para milhares de alvos).
+Para que a memória fique abaixo de memoria_max com milhares de alvos, os alvos são
+avaliados em grupos de alvos seguidos cujos pontos cabem na memória, e cada grupo em
+blocos de períodos; um alvo que sozinho não cabe segue por comprimentos_lote.
+"""
+def comprimentos_multialvo_bloco(tempo, fluxo, offsets, periodos):
+    alvo = np.repeat(np.arange(len(offsets) - 1, dtype=float), np.diff(offsets))
+    fases = tempo[np.newaxis, :] % periodos[:, np.newaxis]
+    chave = np.multiply.outer(periodos, alvo)
+    chave += fases
+    ordem = np.argsort(chave, axis=-1, kind='stable')
+    del chave
+    fases = np.take_along_axis(fases, ordem, axis=-1)
+    fluxos = np.take(fluxo, ordem)
+    distancias = np.zeros(fases.shape)
+    dx = np.diff(fases, axis=-1)
+    dy = np.diff(fluxos, axis=-1)
+    distancias[:, :-1] = np.sqrt(dx*dx + dy*dy)
+    distancias[:, offsets[1:] - 1] = 0.0 # Último ponto de cada alvo não se liga ao próximo
+    return np.add.reduceat(distancias, offsets[:-1], axis=-1)
+
+def comprimentos_multialvo(tempo, fluxo, offsets, periodos, memoria_max=MEMORIA_MAX):
+    tempo = np.asarray(tempo, dtype=float)
+    fluxo = np.asarray(fluxo, dtype=float)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    periodos = np.asarray(periodos, dtype=float)
+    num_alvos = len(offsets) - 1
+    comprimentos = np.empty((num_alvos, len(periodos)))
+    # Além dos 7 vetores da busca simples, a chave (9 vetores por ponto e período) e o
+    # índice do alvo, que não depende do período
+    pontos_max = (memoria_max - FOLGA_MEMORIA) // (10 * 8)
+    primeiro = 0
+    while primeiro < num_alvos:
+        # Maior grupo de alvos seguidos cujos pontos cabem na memória com um período por bloco
+        ultimo = max(int(np.searchsorted(offsets, offsets[primeiro] + pontos_max, 'right')) - 1, primeiro + 1)
+        inicio, fim = offsets[primeiro], offsets[ultimo]
+        if fim - inicio > pontos_max:
+            # Um alvo que sozinho não cabe segue pela busca simples, em pedaços se preciso
+            comprimentos[primeiro] = comprimentos_lote(tempo[inicio:fim], fluxo[inicio:fim], periodos, memoria_max)
+        else:
+            bloco = max(1, int((memoria_max - FOLGA_MEMORIA - 8 * (fim - inicio)) // (9 * 8 * (fim - inicio))))
+            for k in range(0, len(periodos), bloco):
+                comprimentos[primeiro:ultimo, k:k + bloco] = comprimentos_multialvo_bloco(
+                    tempo[inicio:fim], fluxo[inicio:fim], offsets[primeiro:ultimo + 1] - inicio,
+                    periodos[k:k + bloco]).T
+        primeiro = ultimo
+    return comprimentos
+
+#%%
+"""
+Versão para vários alvos de minimizar_comprimento_CL. Devolve, para cada alvo, o
+período de menor comprimento e o menor comprimento, além da grade de períodos e da
+matriz de comprimentos (um alvo por linha). Com cobertura_min a cobertura de fase é
+calculada para cada alvo: os períodos com cobertura baixa em todos os alvos não são
+avaliados, e os comprimentos de baixa cobertura ficam com NaN. Um alvo sem nenhum
+período com cobertura suficiente fica com período e menor comprimento NaN, sem
+interromper os demais.
+"""
+def minimizar_comprimento_multialvo(tempo, fluxo, offsets, periodo_min, periodo_max, dp,
+                                    memoria_max=MEMORIA_MAX, periodos=None, cobertura_min=None):
+    if periodos is None:
+        periodos = np.arange(periodo_min, periodo_max, dp)
+    periodos = np.asarray(periodos, dtype=float)
+    if cobertura_min is None:
+        comprimentos = comprimentos_multialvo(tempo, fluxo, offsets, periodos, memoria_max)
+    else:
+        cobertos = np.array([cobertura_fase(tempo[inicio:fim], periodos, memoria_max=memoria_max)
+                             for inicio, fim in zip(offsets[:-1], offsets[1:])]) >= cobertura_min
+        avaliados = np.any(cobertos, axis=0)
+        comprimentos = np.full(cobertos.shape, np.nan)
+        if np.any(avaliados):
+            comprimentos[:, avaliados] = comprimentos_multialvo(tempo, fluxo, offsets, periodos[avaliados],
+                                                                memoria_max)
+        comprimentos[~cobertos] = np.nan
+    com_minimo = ~np.all(np.isnan(comprimentos), axis=1)
+    indices_menores = np.argmin(np.where(np.isnan(comprimentos), np.inf, comprimentos), axis=1)
+    menores = np.where(com_minimo, comprimentos[np.arange(len(comprimentos)), indices_menores], np.nan)
+    return np.where(com_minimo, periodos[indices_menores], np.nan), periodos, menores, comprimentos
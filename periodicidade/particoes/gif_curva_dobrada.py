@@ -4,20 +4,17 @@
 Gif da evolução temporal da curva de luz dobrada.
 """
 #%%
+import os
+import sys
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from simulacao import gerar_curvas
+
 #%%
 # Funções definidas anteriormente
-def curva_de_luz(tempo, profundidade=0.01, duracao=0.1, periodo=1.0):
-    fluxo = np.ones_like(tempo)
-    for i in range(len(tempo)):
-        fase = (tempo[i] % periodo) / periodo
-        if fase < duracao:
-            fluxo[i] -= profundidade
-    return fluxo
-
 def ruido(curva_luz, sigma=0.001):
     ruido = np.random.normal(0, sigma, len(curva_luz))
     return curva_luz + ruido
@@ -38,7 +35,7 @@ def comprimento_corda(corda):
 # Parâmetros iniciais
 dt = 0.001
 tempo = np.arange(0, 10, dt)
-fluxo_base = curva_de_luz(tempo)
+fluxo_base = gerar_curvas(tempo, profundidade=0.01, duracao=0.1, periodo=1.0, sigma=0.0)[0]
 fluxo_ruidoso = ruido(fluxo_base)
 
 #%%
@@ -4,18 +4,13 @@
 Função para calcular a média dos pontos dentro de uma partição.
 """
 #%%
+import os
+import sys
 import numpy as np
 import matplotlib.pyplot as plt
 
-#%%
-def fluxo_ruidoso(tempo, profundidade, duracao, periodo, sigma):
-    fluxo = np.ones_like(tempo) # Fluxo base normalizado (=1)
-    for i in range(len(tempo)):
-        fase = (tempo[i] % periodo)
-        if fase < duracao:
-            fluxo[i] -= profundidade # Trânsito planetário
-    ruido = np.random.normal(0, sigma, len(fluxo))
-    return fluxo + ruido
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from simulacao import fluxo_ruidoso
 
 #%%
 def media_particao(x, y, num_pontos):
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Simulação de curvas de luz com trânsitos planetários. Em vez de percorrer os pontos
+um a um, a fase de todos os pontos de todas as curvas é calculada de uma vez, então K
+curvas saem juntas como uma matriz (K, N). Os parâmetros de cada curva (profundidade,
+duração, período, ruído, época e forma do trânsito) podem ser escalares, iguais para
+todas as curvas, ou vetores com um valor por curva. Uso:
+    from simulacao import fluxo_ruidoso, gerar_curvas, tempo_tess
+    fluxo = fluxo_ruidoso(tempo, profundidade, duracao, periodo, sigma, 'degrau')
+    fluxos = gerar_curvas(tempo_tess(), 0.01, 0.1, periodos, 0.001, ['degrau', 'limbo'])
+"""
+#%%
+import numpy as np
+
+#%%
+"""
+Formas de trânsito disponíveis:
+    (i) 'degrau': trânsito por uma função degrau;
+    (ii) 'parabola': parábola que vale zero nas bordas e a profundidade no centro;
+    (iii) 'limbo': trânsito central (parâmetro de impacto nulo) de um planeta pequeno
+    sobre uma estrela com escurecimento de limbo quadrático, I(μ) = 1 - u1(1-μ) - u2(1-μ)²;
+    (iv) 'vazio': ausência de trânsito.
+"""
+FORMAS = ('degrau', 'parabola', 'limbo', 'vazio')
+COEF_LIMBO = (0.4, 0.2) # (u1, u2), valores típicos de uma estrela do tipo solar na banda do TESS
+
+#%%
+"""
+Função que gera o vetor de tempo de observações no estilo do TESS: setores de ~27.4
+dias, cada um com uma lacuna no meio (a transmissão dos dados na passagem pelo
+perigeu), com cadência de 2 minutos.
+"""
+def tempo_tess(num_setores=1, duracao_setor=27.4, cadencia=2/1440, lacuna=1.0, intervalo_setores=0.0,
+               inicio=0.0):
+    tempo = []
+    meia_orbita = (duracao_setor - lacuna) / 2
+    for setor in range(num_setores):
+        comeco = inicio + setor * (duracao_setor + intervalo_setores)
+        tempo.append(comeco + np.arange(0, meia_orbita, cadencia))
+        tempo.append(comeco + meia_orbita + lacuna + np.arange(0, meia_orbita, cadencia))
+    return np.concatenate(tempo)
+
+#%%
+"""
+Função que calcula o perfil do trânsito (0 fora do trânsito e 1 no ponto mais fundo)
+a partir de x = fase / duracao, com 0 ≤ x < 1 dentro do trânsito. A forma é um código
+inteiro (índice em FORMAS) por linha.
+"""
+def perfil_transito(x, codigos, coef_limbo=COEF_LIMBO):
+    perfil = np.zeros(np.broadcast_shapes(x.shape, codigos.shape))
+    dentro = (x >= 0) & (x < 1)
+    codigos = np.broadcast_to(codigos, perfil.shape)
+    u1, u2 = coef_limbo
+    # Cada forma é calculada apenas nos pontos dentro do trânsito das curvas com essa forma
+    for codigo, forma in enumerate(FORMAS):
+        selecao = dentro & (codigos == codigo)
+        if forma == 'degrau':
+            perfil[selecao] = 1.0
+        elif forma == 'parabola':
+            xs = x[selecao]
+            perfil[selecao] = 4 * xs * (1 - xs)
+        elif forma == 'limbo':
+            # Distância ao centro do disco estelar ao longo da corda central, de 0 a 1
+            r = np.abs(2*x[selecao] - 1)
+            um_menos_mu = 1 - np.sqrt(1 - r*r)
+            perfil[selecao] = 1 - u1*um_menos_mu - u2*um_menos_mu**2
+    return perfil
+
+#%%
+"""
+Função principal. O tempo é um vetor (N,) compartilhado por todas as curvas ou uma
+matriz (K, N). Como no restante do repositório, o trânsito começa na época e ocupa as
+fases [0, duracao). Retorna a matriz (K, N) dos fluxos normalizados (=1) com ruído
+gaussiano de desvio padrão sigma. Sem rng o ruído vem do gerador global do numpy,
+então np.random.seed(...) torna a simulação repetível como antes.
+"""
+def gerar_curvas(tempo, profundidade, duracao, periodo, sigma, transito='degrau', epoca=0.0,
+                 coef_limbo=COEF_LIMBO, rng=None):
+    rng = np.random if rng is None else rng
+    tempo = np.atleast_2d(np.asarray(tempo, dtype=float))
+    transito = np.atleast_1d(transito)
+    codigos = np.array([FORMAS.index(forma) for forma in transito])
+    parametros = np.broadcast_arrays(*(np.atleast_1d(np.asarray(p, dtype=float))
+                                       for p in (profundidade, duracao, periodo, sigma, epoca)), codigos)
+    num_curvas = max(len(parametros[0]), len(tempo))
+    profundidade, duracao, periodo, sigma, epoca, codigos = (np.broadcast_to(p, num_curvas)[:, np.newaxis]
+                                                              for p in parametros)
+    x = ((tempo - epoca) % periodo) / duracao
+    fluxo = 1 - profundidade * perfil_transito(x, codigos, coef_limbo)
+    return fluxo + sigma * rng.standard_normal(fluxo.shape)
+
+#%%
+"""
+Versão para uma única curva, com a mesma chamada usada nos códigos de determinação
+de período.
+"""
+def fluxo_ruidoso(tempo, profundidade, duracao, periodo, sigma, transito='degrau', rng=None):
+    return gerar_curvas(tempo, profundidade, duracao, periodo, sigma, transito, rng=rng)[0]
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Testes da busca de período incremental (periodicidade/busca_incremental.py). Rodar com:
+    python -m pytest tests
+"""
+#%%
+import os
+import sys
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'periodicidade'))
+from busca_incremental import (adicionar_setor, buscar_periodo_incremental, criar_estatistica, grade_adequada,
+                               nova_estatistica)
+from grade_periodos import grade_periodos
+from simulacao import fluxo_ruidoso, tempo_tess
+
+#%%
+def test_setores_somados_uma_vez(tmp_path):
+    tempo = tempo_tess(2)
+    fluxo = fluxo_ruidoso(tempo, 0.01, 0.1, 1.7, 0.001, rng=np.random.default_rng(0))
+    caminho = str(tmp_path / 'alvo.npz')
+    criar_estatistica(caminho, np.arange(1.5, 1.9, 0.001), epoca=tempo[0])
+    metade = len(tempo) // 2
+    adicionar_setor(caminho, tempo[:metade], fluxo[:metade], setor=1)
+    adicionar_setor(caminho, tempo[metade:], fluxo[metade:], setor=2)
+    estatistica = adicionar_setor(caminho, tempo[metade:], fluxo[metade:], setor=2)
+    assert np.sum(estatistica['contagens'][0]) == len(tempo)
+    assert abs(buscar_periodo_incremental(caminho)[0] - 1.7) < 0.002
+
+def test_grade_fica_grossa_com_mais_setores():
+    tempo = tempo_tess(1)
+    duracao = 0.1
+    estatistica = nova_estatistica(grade_periodos(tempo, 0.5, 5.0, duracao), tempo[0])
+    tempo_total = np.ptp(tempo)
+    assert grade_adequada(estatistica, duracao, tempo_total)
+    assert grade_adequada(estatistica, duracao, 1.9 * tempo_total)
+    assert not grade_adequada(estatistica, duracao, 3 * tempo_total)
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Testes da busca com cobertura mínima de fase (periodicidade/motor_periodo.py). Rodar com:
+    python -m pytest tests
+"""
+#%%
+import os
+import sys
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'periodicidade'))
+from motor_periodo import concatenar_curvas, minimizar_comprimento_CL, minimizar_comprimento_multialvo
+from simulacao import fluxo_ruidoso
+
+#%%
+PERIODOS = np.arange(0.5, 1.5, 0.01)
+
+# Tempos com um pequeno desvio aleatório: com a cadência exata, períodos múltiplos dela dão
+# fases repetidas, cuja ordem na busca multialvo depende do arredondamento da chave
+def curva(dias, semente):
+    rng = np.random.default_rng(semente)
+    tempo = np.arange(0, dias, 0.004)
+    tempo += rng.uniform(0, 0.001, len(tempo))
+    return tempo, fluxo_ruidoso(tempo, 0.01, 0.1, 0.8, 0.001, rng=rng)
+
+#%%
+def test_alvo_sem_cobertura_fica_com_nan():
+    # 0.3 dia de dados não cobre a fase de nenhum período da grade
+    tempo, fluxo = curva(0.3, 0)
+    periodo, periodos, menor, comprimentos = minimizar_comprimento_CL(tempo, fluxo, None, None, None,
+                                                                      periodos=PERIODOS, cobertura_min=0.9)
+    assert np.isnan(periodo) and np.isnan(menor) and np.all(np.isnan(comprimentos))
+
+def test_multialvo_nao_interrompe_os_demais():
+    curvas = [curva(5, 1), curva(0.3, 2), curva(5, 3)]
+    tempo, fluxo, offsets = concatenar_curvas([c[0] for c in curvas], [c[1] for c in curvas])
+    periodos_menores, _, menores, _ = minimizar_comprimento_multialvo(tempo, fluxo, offsets, None, None, None,
+                                                                      periodos=PERIODOS, cobertura_min=0.9)
+    assert np.isnan(periodos_menores[1]) and np.isnan(menores[1])
+    for k in (0, 2):
+        periodo, _, menor, _ = minimizar_comprimento_CL(*curvas[k], None, None, None, periodos=PERIODOS,
+                                                        cobertura_min=0.9)
+        assert periodos_menores[k] == periodo and np.isclose(menores[k], menor)
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Testes da probabilidade de falso alarme (periodicidade/falso_alarme.py). Rodar com:
+    python -m pytest tests
+"""
+#%%
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'periodicidade'))
+from falso_alarme import probabilidade_falso_alarme
+from simulacao import fluxo_ruidoso
+
+#%%
+def curva(profundidade, semente=0):
+    tempo = np.arange(0, 3, 0.004)
+    return tempo, fluxo_ruidoso(tempo, profundidade, 0.1, 1.0, 0.001, rng=np.random.default_rng(semente))
+
+@pytest.mark.parametrize('limiar', [0.01, 0.05, None])
+def test_resultado_nao_depende_dos_processos(limiar):
+    tempo, fluxo = curva(0.0005)
+    periodos = np.arange(0.5, 1.5, 0.01)
+    resultados = [probabilidade_falso_alarme(tempo, fluxo, periodos, max_tentativas=96, limiar=limiar, workers=w)
+                  for w in (None, 2, 3)]
+    for fap, intervalo, tentativas, minimos in resultados[1:]:
+        assert fap == resultados[0][0] and intervalo == resultados[0][1] and tentativas == resultados[0][2]
+        assert np.array_equal(minimos, resultados[0][3])
+
+def test_intervalo_contem_a_fap():
+    for profundidade in (0.0, 0.01):
+        tempo, fluxo = curva(profundidade)
+        fap, (inferior, superior), _, _ = probabilidade_falso_alarme(tempo, fluxo, np.arange(0.5, 1.5, 0.01),
+                                                                     max_tentativas=64)
+        assert inferior <= fap <= superior
+
+def test_max_tentativas_invalido():
+    tempo, fluxo = curva(0.0)
+    with pytest.raises(ValueError):
+        probabilidade_falso_alarme(tempo, fluxo, np.arange(0.5, 1.5, 0.01), max_tentativas=0)
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Testes do armazenamento local de arquivos FITS (analise/fits_store.py) com a fonte
+local (local_archive) no lugar do MAST. Os arquivos são bytes aleatórios: o
+armazenamento não lê o conteúdo, apenas o hash. Rodar com:
+    python -m pytest tests
+"""
+#%%
+import os
+import sys
+import time
+import threading
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'analise'))
+import fits_store as fs
+
+#%%
+def criar_arquivo(pasta, tic, setor, conteudo=None, tamanho=1000):
+    caminho = os.path.join(pasta, f'tic{tic}_s{setor:04d}_SPOC_short.fits')
+    with open(caminho, 'wb') as arquivo:
+        arquivo.write(os.urandom(tamanho) if conteudo is None else conteudo)
+    return caminho
+
+# Fonte local que conta quantas vezes foi pesquisada
+def fonte_contada(pasta):
+    fonte = fs.local_archive(pasta)
+    def pesquisar(tic, author, cadence):
+        pesquisar.chamadas += 1
+        return fonte(tic, author, cadence)
+    pesquisar.chamadas = 0
+    return pesquisar
+
+def preparar(tmp_path, setores=(1, 2, 3), tic=123):
+    pasta = tmp_path / 'fonte'
+    pasta.mkdir()
+    for setor in setores:
+        criar_arquivo(pasta, tic, setor)
+    return str(pasta), str(tmp_path / 'armazenamento'), fonte_contada(str(pasta))
+
+#%%
+def test_download_e_pesquisa_reaproveitada(tmp_path):
+    _, armazenamento, fonte = preparar(tmp_path)
+    caminhos = fs.fetch_light_curves(123, archive=fonte, store_dir=armazenamento)
+    assert len(caminhos) == 3 and all(os.path.exists(c) for c in caminhos)
+    assert fs.fetch_light_curves(123, archive=fonte, store_dir=armazenamento) == caminhos
+    assert fonte.chamadas == 1
+
+def test_conteudo_repetido_guardado_uma_vez(tmp_path):
+    pasta, armazenamento, fonte = preparar(tmp_path, setores=(1,))
+    with open(os.path.join(pasta, 'tic123_s0001_SPOC_short.fits'), 'rb') as arquivo:
+        criar_arquivo(pasta, 123, 2, arquivo.read())
+    caminhos = fs.fetch_light_curves(123, archive=fonte, store_dir=armazenamento)
+    assert len(caminhos) == 2 and caminhos[0] == caminhos[1]
+    informacoes = fs.store_info(armazenamento)
+    assert informacoes['num_files'] == 1 and informacoes['num_entries'] == 2
+
+def test_modo_offline_nao_pesquisa(tmp_path):
+    _, armazenamento, fonte = preparar(tmp_path)
+    assert fs.fetch_light_curves(123, archive=fonte, store_dir=armazenamento, offline=True) == []
+    fs.fetch_light_curves(123, archive=fonte, store_dir=armazenamento, sectors=[2])
+    caminhos = fs.fetch_light_curves(123, archive=fonte, store_dir=armazenamento, offline=True)
+    assert len(caminhos) == 1 and fonte.chamadas == 1
+
+def test_evict_apaga_os_menos_usados(tmp_path):
+    _, armazenamento, fonte = preparar(tmp_path)
+    fs.fetch_light_curves(123, archive=fonte, store_dir=armazenamento)
+    usado = fs.local_entries(123, 'SPOC', 'short', {2}, armazenamento)[2]
+    fs.evict(1500, armazenamento)
+    assert fs.store_info(armazenamento)['num_files'] == 1
+    assert os.path.exists(usado)
+
+def test_evict_respeita_keep(tmp_path):
+    _, armazenamento, fonte = preparar(tmp_path)
+    caminhos = fs.fetch_light_curves(123, archive=fonte, store_dir=armazenamento)
+    manter = [os.path.basename(c)[:-len('.fits')] for c in caminhos]
+    fs.evict(0, armazenamento, keep=manter)
+    assert fs.store_info(armazenamento)['num_files'] == 3
+
+#%%
+"""
+Regressões: a pesquisa guardada não pode esconder setores que não estão no disco.
+"""
+def test_setores_parciais_depois_todos(tmp_path):
+    _, armazenamento, fonte = preparar(tmp_path)
+    assert len(fs.fetch_light_curves(123, archive=fonte, store_dir=armazenamento, sectors=[1])) == 1
+    assert len(fs.fetch_light_curves(123, archive=fonte, store_dir=armazenamento)) == 3
+    assert fonte.chamadas == 2
+    assert len(fs.fetch_light_curves(123, archive=fonte, store_dir=armazenamento)) == 3
+    assert fonte.chamadas == 2
+
+def test_pesquisa_refeita_depois_do_evict(tmp_path):
+    _, armazenamento, fonte = preparar(tmp_path)
+    fs.fetch_light_curves(123, archive=fonte, store_dir=armazenamento)
+    fs.evict(0, armazenamento)
+    assert fs.store_info(armazenamento)['num_files'] == 0
+    assert len(fs.fetch_light_curves(123, archive=fonte, store_dir=armazenamento)) == 3
+    assert fonte.chamadas == 2
+
+def test_setor_ausente_na_fonte_nao_repete_pesquisa(tmp_path):
+    _, armazenamento, fonte = preparar(tmp_path)
+    assert len(fs.fetch_light_curves(123, archive=fonte, store_dir=armazenamento, sectors=[1, 99])) == 1
+    assert len(fs.fetch_light_curves(123, archive=fonte, store_dir=armazenamento, sectors=[1, 99])) == 1
+    assert fonte.chamadas == 1
+
+#%%
+"""
+Etapa de download concorrente (fetch_many) com uma fonte que demora e falha em alguns
+alvos.
+"""
+# Fonte local com latência e um número de falhas por alvo (-1: falha sempre)
+def fonte_instavel(pasta, latencia, falhas):
+    fonte = fs.local_archive(pasta)
+    trava = threading.Lock()
+    def pesquisar(tic, author, cadence):
+        time.sleep(latencia)
+        with trava:
+            if falhas.get(tic, 0) != 0:
+                falhas[tic] -= 1
+                raise ConnectionError(f'falha simulada no TIC {tic}')
+        return fonte(tic, author, cadence)
+    return pesquisar
+
+def preparar_alvos(tmp_path, num_alvos=8):
+    pasta = tmp_path / 'fonte'
+    pasta.mkdir()
+    for tic in range(num_alvos):
+        for setor in (1, 2):
+            criar_arquivo(pasta, tic, setor)
+    return str(pasta), str(tmp_path / 'armazenamento')
+
+def test_fetch_many_concorrente_com_novas_tentativas(tmp_path):
+    pasta, armazenamento = preparar_alvos(tmp_path)
+    fonte = fonte_instavel(pasta, 0.2, {3: 2, 5: 1})
+    inicio = time.perf_counter()
+    resultados = list(fs.fetch_many(range(8), workers=8, backoff=0.01, archive=fonte, store_dir=armazenamento))
+    duracao = time.perf_counter() - inicio
+    assert sorted(i for i, _, _ in resultados) == list(range(8))
+    assert all(error is None and len(paths) == 2 for _, paths, error in resultados)
+    # Em série seriam pelo menos 8 + 3 pesquisas de 0.2 s
+    assert duracao < 1.2
+
+def test_fetch_many_limita_as_threads(tmp_path):
+    pasta, armazenamento = preparar_alvos(tmp_path)
+    fonte = fs.local_archive(pasta)
+    ativas = []
+    trava = threading.Lock()
+    def pesquisar(tic, author, cadence):
+        with trava:
+            ativas.append(threading.active_count())
+        time.sleep(0.05)
+        return fonte(tic, author, cadence)
+    antes = threading.active_count()
+    list(fs.fetch_many(range(8), workers=2, archive=pesquisar, store_dir=armazenamento))
+    assert max(ativas) <= antes + 2
+
+def test_fetch_many_falha_de_um_alvo_nao_interrompe(tmp_path):
+    pasta, armazenamento = preparar_alvos(tmp_path)
+    fonte = fonte_instavel(pasta, 0.0, {4: -1})
+    resultados = {i: (paths, error) for i, paths, error in
+                  fs.fetch_many(range(8), workers=3, retries=2, backoff=0.01, archive=fonte, store_dir=armazenamento)}
+    assert len(resultados) == 8
+    assert resultados[4][0] is None and isinstance(resultados[4][1], ConnectionError)
+    assert all(error is None and len(paths) == 2 for i, (paths, error) in resultados.items() if i != 4)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Testes das etapas do processamento setor a setor (analise/sector_stream.py) com
+setores sintéticos, sem ler arquivos FITS. Rodar com:
+    python -m pytest tests
+"""
+#%%
+import os
+import sys
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'analise'))
+from sector_stream import BIN_WIDTH, clean_sectors, accumulate_sectors, transit_profile
+
+#%%
+PERIODO = 2.0
+DURACAO = 0.1
+PROFUNDIDADE = 0.01
+
+# Setor com um trânsito em fase 0.5 e fluxo em torno de 'nivel'
+def setor(numero, inicio, nivel=1000.0, passo=0.002, dias=10):
+    tempo = np.arange(inicio, inicio + dias, passo)
+    fase = (tempo - inicio) % PERIODO / PERIODO
+    fluxo = np.where(np.abs(fase - 0.5) < DURACAO / PERIODO / 2, 1 - PROFUNDIDADE, 1.0) * nivel
+    return {'sector': numero, 'time': tempo, 'flux': fluxo, 'flux_err': np.full(len(tempo), nivel * 1e-3),
+            'quality': np.zeros(len(tempo), dtype=np.int64)}
+
+#%%
+def test_limpeza_remove_nan_e_cadencias_marcadas():
+    dados = setor(1, 0.0)
+    dados['flux'][:10] = np.nan
+    dados['time'][10:20] = np.nan
+    dados['quality'][20:30] = 32 # Descarga de momento
+    dados['quality'][30:40] = 4096 # Bit fora da máscara padrão
+    limpo, = clean_sectors([dados])
+    assert len(limpo['time']) == len(dados['time']) - 30
+    assert np.all(np.isfinite(limpo['time'])) and np.all(np.isfinite(limpo['flux']))
+    assert np.isclose(np.median(limpo['flux']), 1.0)
+    assert np.allclose(limpo['flux_err'], 1e-3)
+
+def test_limpeza_pula_setor_vazio():
+    vazio = setor(1, 0.0)
+    vazio['flux'][:] = np.nan
+    limpos = list(clean_sectors([vazio, setor(2, 20.0)]))
+    assert [s['sector'] for s in limpos] == [2]
+
+def test_acumulacao_igual_a_curva_completa():
+    # Setores com níveis diferentes: depois de normalizados, somar setor a setor é o mesmo
+    # que somar a curva concatenada de uma vez
+    setores = [setor(1, 0.0, nivel=1000.0), setor(2, 30.0, nivel=2500.0)]
+    periodos = np.arange(1.5, 2.5, 0.05)
+    *_, final = accumulate_sectors(clean_sectors(setores), PERIODO, periods=periodos, num_partitions=50)
+    limpos = list(clean_sectors(setores))
+    *_, completo = accumulate_sectors([{'sector': None,
+                                        'time': np.concatenate([s['time'] for s in limpos]),
+                                        'flux': np.concatenate([s['flux'] for s in limpos])}],
+                                      PERIODO, periods=periodos, num_partitions=50)
+    assert final['num_points'] == completo['num_points'] == sum(len(s['time']) for s in limpos)
+    for chave in ('fold', 'search'):
+        for soma in ('contagens', 'soma_fluxo', 'soma_fluxo2'):
+            assert np.allclose(final[chave][soma], completo[chave][soma])
+    assert list(final['fold']['setores']) == [1, 2]
+
+def test_acumulacao_entrega_um_resultado_por_setor():
+    resultados = [acumuladores['num_points']
+                  for acumuladores in accumulate_sectors(clean_sectors([setor(1, 0.0), setor(2, 30.0)]), PERIODO)]
+    assert len(resultados) == 2 and resultados[1] == 2 * resultados[0]
+
+def test_perfil_centrado_no_transito():
+    *_, acumuladores = accumulate_sectors(clean_sectors([setor(1, 0.0), setor(2, 30.0)]), PERIODO)
+    fase, fluxo, contagens = transit_profile(acumuladores['fold'])
+    assert np.all(np.diff(fase) > 0) and -PERIODO / 2 <= fase[0] and fase[-1] < PERIODO / 2
+    ocupadas = contagens > 0
+    no_transito = ocupadas & (fluxo < 1 - PROFUNDIDADE / 2)
+    # O trânsito é plano, então o centro pode cair em qualquer partição dele, mas todo o
+    # trânsito fica a menos de uma duração do centro
+    assert np.sum(no_transito) >= DURACAO / BIN_WIDTH - 2
+    assert np.all(np.abs(fase[no_transito]) < DURACAO)
+    assert np.allclose(fluxo[ocupadas & (np.abs(fase) > DURACAO)], 1.0)